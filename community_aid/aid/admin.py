@@ -1,7 +1,105 @@
 # aid/admin.py
-from django.contrib import admin
+import json
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.utils import model_ngettext
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Project, Donation, Beneficiary, Volunteer
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .approvals import beneficiary_workflow, set_state, volunteer_workflow
+from .models import (
+    User, Project, Donation, Beneficiary, Volunteer, PaymentIntent, ApprovalAudit, Notification, Job, ProjectArchive,
+)
+from .images import InvalidImage, generate_variants, process_upload
+from .search import search_beneficiaries, search_projects, uses_postgres
+from .tasks import enqueue
+
+
+def estimated_count(queryset):
+    """
+    queryset.count(), unless PostgreSQL expects more rows than
+    AID_ADMIN_EXACT_COUNT_LIMIT: then its estimate, from the table
+    statistics for a whole table or the planner for a filtered one.
+    """
+    if not uses_postgres(queryset):
+        return queryset.count()
+    with connections[queryset.db].cursor() as cursor:
+        if not queryset.query.where:
+            # A partitioned parent is never analyzed by autovacuum; add up its partitions
+            cursor.execute(
+                "SELECT CASE WHEN c.relkind = 'p' THEN ("
+                "  SELECT coalesce(sum(greatest(p.reltuples, 0)), 0) FROM pg_inherits i"
+                "  JOIN pg_class p ON p.oid = i.inhrelid WHERE i.inhparent = c.oid"
+                ") ELSE c.reltuples END::bigint FROM pg_class c WHERE c.oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            estimate = cursor.fetchone()[0]  # -1 until the table is first analyzed
+        else:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            estimate = (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]["Plan Rows"]
+    if estimate < getattr(settings, "AID_ADMIN_EXACT_COUNT_LIMIT", 100000):
+        return queryset.count()
+    return estimate
+
+
+def as_id(value):
+    """
+    value as an integer primary key, or None. str.isdigit() alone lets
+    through "²" and numbers past a bigint, which blow up in the query.
+    """
+    value = value.strip()
+    if value.isascii() and value.isdigit() and int(value) < 2 ** 63:
+        return int(value)
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables that grow without bound: estimated
+    counts past AID_ADMIN_EXACT_COUNT_LIMIT, and no second COUNT(*) of
+    the unfiltered table for "(N total)".
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ProjectListFilter(admin.SimpleListFilter):
+    """
+    Filter by project without loading every project into the sidebar: it
+    offers the most recently started ones plus the one selected, and any
+    other project is reachable as ?project=<id>.
+    """
+    title = "project"
+    parameter_name = "project"
+    shown = 20
+
+    def lookups(self, request, model_admin):
+        projects = list(Project.objects.order_by("-start_date", "-pk").values_list("pk", "title")[:self.shown])
+        selected = as_id(self.value() or "")
+        if selected is not None and all(pk != selected for pk, _ in projects):
+            projects += Project.objects.filter(pk=selected).values_list("pk", "title")
+        return projects
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        project_id = as_id(self.value())
+        if project_id is None:
+            raise IncorrectLookupParameters
+        return queryset.filter(project_id=project_id)
+
 
 # Register custom User with standard UserAdmin
 @admin.register(User)
@@ -13,52 +111,163 @@ class CustomUserAdmin(UserAdmin):
     add_fieldsets = UserAdmin.add_fieldsets + (
         ("Additional Info", {"fields": ("date_of_birth", "profile_photo")}),
     )
-    search_fields = ["username", "email"]
+    # Prefix match on the username's pattern index, exact match on the email's unique index
+    search_fields = ["username__startswith", "email__exact"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        # Run admin uploads through the same pipeline as the API
+        if "profile_photo" in form.changed_data and obj.profile_photo:
+            try:
+                obj.profile_photo = process_upload(form.cleaned_data["profile_photo"])
+            except InvalidImage as e:
+                self.message_user(request, f"Profile photo not saved: {e}", level=messages.ERROR)
+                obj.profile_photo = form.initial.get("profile_photo")
+            else:
+                enqueue(generate_variants, obj.profile_photo.name, queue="images")
+        super().save_model(request, obj, form, change)
 
 
 # Register other models
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     list_display = ("title", "status", "start_date", "end_date", "created_by")
+    list_select_related = ("created_by",)
     search_fields = ("title", "description", "status")
     list_filter = ("status", "start_date", "end_date")
+    autocomplete_fields = ["created_by"]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Ranked full-text search on the GIN index; plain icontains elsewhere
+        if search_term and uses_postgres(queryset):
+            return search_projects(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
 
 
 @admin.register(Donation)
-class DonationAdmin(admin.ModelAdmin):
+class DonationAdmin(LargeTableAdmin):
     list_display = ("donor", "project", "amount", "date")
-    search_fields = ("donor__username", "project__title")
-    list_filter = ("date",)
+    list_select_related = ("donor", "project")
+    # Donor lookups go user index -> aid_donation_donor_date_idx; projects are a filter
+    search_fields = ("donor__username__startswith", "donor__email__exact")
+    list_filter = ("date", ProjectListFilter)
     autocomplete_fields = ["donor", "project"]
 
 
 @admin.register(Beneficiary)
-class BeneficiaryAdmin(admin.ModelAdmin):
+class BeneficiaryAdmin(LargeTableAdmin):
     list_display = ("name", "project", "contact_info")
+    list_select_related = ("project",)
     search_fields = ("name", "project__title")
-    list_filter = ("approved",)  # Filter by approved/unapproved in admin panel
+    list_filter = ("approved", ProjectListFilter)  # Filter by approved/rejected/pending in admin panel
+    autocomplete_fields = ["project"]
     actions = ["approve_selected"]
 
-    def approve_selected(self, request, queryset):   # noqa: ARG001
-        queryset.update(approved=True)
+    def get_search_results(self, request, queryset, search_term):
+        # Fuzzy name match on the trigram index, most similar first
+        if search_term and uses_postgres(queryset):
+            return search_beneficiaries(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def approve_selected(self, request, queryset):
+        updated = set_state(beneficiary_workflow, queryset, "approve", request.user)
+        self.message_user(request, f"Approved {updated} {model_ngettext(self.opts, updated)}.")
     approve_selected.short_description = "Approve selected beneficiaries"
 
 
 # 🔥 Volunteer Admin with approval actions (added only, rest remains same)
 @admin.register(Volunteer)
-class VolunteerAdmin(admin.ModelAdmin):
+class VolunteerAdmin(LargeTableAdmin):
     list_display = ("user", "project", "role", "status", "date_joined")
-    search_fields = ("user__username", "project__title", "role")
-    list_filter = ("status", "date_joined", "project")
+    list_select_related = ("user", "project")
+    search_fields = ("user__username__startswith", "user__email__exact")
+    list_filter = ("status", "date_joined", ProjectListFilter)
+    autocomplete_fields = ["user", "project"]
 
     actions = ["approve_selected", "reject_selected"]
 
-    def approve_selected(self, request, queryset):  # noqa: ARG001
-     queryset.update(status="approved")
+    def approve_selected(self, request, queryset):
+     updated = set_state(volunteer_workflow, queryset, "approve", request.user)
+     self.message_user(request, f"Approved {updated} {model_ngettext(self.opts, updated)}.")
     approve_selected.short_description = "Approve selected volunteers"
 
-    def reject_selected(self, request, queryset):  # noqa: ARG001
-     queryset.update(status="rejected")
+    def reject_selected(self, request, queryset):
+     updated = set_state(volunteer_workflow, queryset, "reject", request.user)
+     self.message_user(request, f"Rejected {updated} {model_ngettext(self.opts, updated)}.")
     reject_selected.short_description = "Reject selected volunteers"
 
 
+
+
+@admin.register(PaymentIntent)
+class PaymentIntentAdmin(LargeTableAdmin):
+    list_display = ("tx_ref", "donor", "project", "amount", "status", "created_at")
+    list_select_related = ("donor", "project")
+    # Both on indexes of this table, so PostgreSQL can OR them
+    search_fields = ("tx_ref__exact", "gateway_reference__exact")
+    list_filter = ("status",)
+    autocomplete_fields = ["donor", "project"]
+    readonly_fields = ("donation",)
+
+
+@admin.register(ApprovalAudit)
+class ApprovalAuditAdmin(LargeTableAdmin):
+    list_display = ("subject_type", "subject_id", "from_state", "to_state", "actor", "created_at")
+    list_select_related = ("actor",)
+    list_filter = ("subject_type", "to_state")
+    search_fields = ("subject_id",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # An integer comparison; the default casts subject_id to text for every row
+        if not search_term.strip():
+            return queryset, False
+        subject_id = as_id(search_term)
+        return (queryset.filter(subject_id=subject_id) if subject_id is not None else queryset.none()), False
+
+    # The trail is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProjectArchive)
+class ProjectArchiveAdmin(admin.ModelAdmin):
+    list_display = ("project", "archived_at", "donation_count", "donation_total", "volunteer_count", "beneficiary_count")
+    list_select_related = ("project",)
+
+    # Written by archive_projects; restoring goes through the command too
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ("subject", "recipient", "created_at", "sent_at")
+    list_select_related = ("recipient",)
+    readonly_fields = ("recipient",)
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ("name", "queue", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "queue")
+    search_fields = ("name",)
+    readonly_fields = ("locked_by", "locked_at", "last_error", "finished_at")
+    actions = ["retry_now"]
+
+    def retry_now(self, request, queryset):
+        updated = queryset.filter(status__in=("queued", "failed")).update(
+            status="queued", run_at=timezone.now(), attempts=0,
+            locked_by="", locked_at=None, last_error="", finished_at=None,
+        )
+        self.message_user(request, f"Queued {updated} {model_ngettext(self.opts, updated)} to run again.")
+    retry_now.short_description = "Run selected jobs again now"
@@ -0,0 +1,132 @@
+"""
+Donation trends served from the daily rollup tables.
+
+Queries read at most one row per day (per project or donor) in the
+requested range and bucket them into weeks or months in Python, so a
+multi-year series costs a few thousand index-range rows no matter how
+many donations it covers.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import DailyDonorDonations, DailyProjectDonations
+
+INTERVALS = ("day", "week", "month")
+DEFAULT_RANGE_DAYS = 365
+MAX_MOVING_AVERAGE = 365
+MAX_PERIODS = 3660  # ten years of days
+
+
+def parse_range(params):
+    """
+    start/end query parameters (inclusive ISO dates); defaults to the last year.
+    """
+    end = _parse_day(params.get("end"), "end") or timezone.localdate()
+    start = _parse_day(params.get("start"), "start") or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise ValidationError({"start": "Must not be after end"})
+    return start, end
+
+
+def _parse_day(value, name):
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: "Expected a date (YYYY-MM-DD)"})
+    return day
+
+
+def period_start(day, interval):
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_count(start, end, interval):
+    if interval == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    if interval == "week":
+        return (end - period_start(start, interval)).days // 7 + 1
+    return (end - start).days + 1
+
+
+def periods(start, end, interval):
+    current = period_start(start, interval)
+    while current <= end:
+        yield current
+        try:
+            if interval == "day":
+                current += timedelta(days=1)
+            elif interval == "week":
+                current += timedelta(days=7)
+            else:
+                current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        except (OverflowError, ValueError):
+            return  # past date.max: end was the last representable period
+
+
+def time_series(start, end, interval="day", project=None, donor=None, moving_average=None):
+    if interval not in INTERVALS:
+        raise ValidationError({"interval": f"Expected one of: {', '.join(INTERVALS)}"})
+    if period_count(start, end, interval) > MAX_PERIODS:
+        raise ValidationError({"detail": f"At most {MAX_PERIODS} {interval}s per series; narrow the range or widen the interval"})
+    if donor is not None:
+        rows = DailyDonorDonations.objects.filter(donor_id=donor)
+        if project is not None:
+            raise ValidationError({"detail": "Filter by project or by donor, not both"})
+    else:
+        rows = DailyProjectDonations.objects.all()
+        if project is not None:
+            rows = rows.filter(project_id=project)
+
+    daily = (
+        rows.filter(day__range=(start, end))
+        .values("day").annotate(total=Sum("total_amount"), count=Sum("donation_count")).order_by()
+    )
+    buckets = {}
+    for row in daily:
+        key = period_start(row["day"], interval)
+        total, count = buckets.get(key, (Decimal(0), 0))
+        buckets[key] = (total + row["total"], count + row["count"])
+
+    results = []
+    window = []
+    for key in periods(start, end, interval):
+        total, count = buckets.get(key, (Decimal("0.00"), 0))
+        point = {"period": key, "total": total, "count": count}
+        if moving_average:
+            window.append(total)
+            if len(window) > moving_average:
+                window.pop(0)
+            point["moving_average"] = (sum(window) / len(window)).quantize(Decimal("0.01"))
+        results.append(point)
+    return results
+
+
+def top_donors(start, end, limit=10):
+    return list(
+        DailyDonorDonations.objects.filter(day__range=(start, end))
+        .values("donor_id", "donor__username")
+        .annotate(total=Sum("total_amount"), count=Sum("donation_count"))
+        .order_by("-total")[:limit]
+    )
+
+
+def top_projects(start, end, limit=10):
+    return list(
+        DailyProjectDonations.objects.filter(day__range=(start, end))
+        .values("project_id", "project__title")
+        .annotate(total=Sum("total_amount"), count=Sum("donation_count"))
+        .order_by("-total")[:limit]
+    )
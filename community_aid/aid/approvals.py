@@ -0,0 +1,156 @@
+"""
+Bulk approve/reject for volunteers and beneficiaries.
+
+set_state() moves every selected row to the target state with one UPDATE,
+writes an ApprovalAudit row per actual transition with bulk_create, and
+queues notifications for the background worker, all in one transaction.
+Rows already in the target state are left alone and get no audit row.
+ApprovalMixin exposes it as POST <list>/approve/ and <list>/reject/, the
+admin actions call it directly.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from . import notifications
+from .cache import invalidate
+from .models import ApprovalAudit, Beneficiary, Notification, Volunteer
+from .permissions import CanApproveBeneficiary
+from .serializers import BulkApprovalSerializer
+
+
+class VolunteerWorkflow:
+    model = Volunteer
+    subject_type = "volunteer"
+    field = "status"
+    states = {"approve": "approved", "reject": "rejected"}
+    cache_group = "volunteers"
+    # pk and current state first, then what the notifications need
+    columns = ("pk", "status", "user_id", "project__title")
+
+    def label(self, value):
+        return value
+
+    def notifications(self, rows, target):
+        state = self.label(target)
+        return [
+            Notification(
+                recipient_id=user_id,
+                subject=f"Your volunteer application was {state}",
+                message=f"Your application to volunteer on {title} was {state}.",
+            )
+            for _, _, user_id, title in rows
+        ]
+
+
+class BeneficiaryWorkflow:
+    model = Beneficiary
+    subject_type = "beneficiary"
+    field = "approved"
+    states = {"approve": True, "reject": False}
+    cache_group = "beneficiaries"
+    columns = ("pk", "approved", "project__created_by_id", "project__title")
+
+    def label(self, value):
+        return {True: "approved", False: "rejected", None: "pending"}[value]
+
+    def notifications(self, rows, target):
+        # Beneficiaries have no account; tell each project's owner once
+        per_project = defaultdict(int)
+        for _, _, owner_id, title in rows:
+            per_project[owner_id, title] += 1
+        state = self.label(target)
+        return [
+            Notification(
+                recipient_id=owner_id,
+                subject=f"Beneficiaries {state} for {title}",
+                message=f"{count} beneficiaries of {title} were {state}.",
+            )
+            for (owner_id, title), count in per_project.items()
+        ]
+
+
+volunteer_workflow = VolunteerWorkflow()
+beneficiary_workflow = BeneficiaryWorkflow()
+
+
+def set_state(workflow, queryset, action_name, actor):
+    """
+    Apply approve/reject to every row of queryset. Returns how many changed.
+    """
+    target = workflow.states[action_name]
+    with transaction.atomic():
+        rows = list(
+            queryset.exclude(**{workflow.field: target})
+            .select_for_update(of=("self",))
+            .values_list(*workflow.columns)
+        )
+        if not rows:
+            return 0
+        pks = [row[0] for row in rows]
+        workflow.model.objects.filter(pk__in=pks).update(**{workflow.field: target})
+        ApprovalAudit.objects.bulk_create(
+            [
+                ApprovalAudit(
+                    subject_type=workflow.subject_type,
+                    subject_id=row[0],
+                    from_state=workflow.label(row[1]),
+                    to_state=workflow.label(target),
+                    actor=actor,
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+        )
+        notifications.queue(workflow.notifications(rows, target))
+        invalidate(workflow.cache_group)  # update() sends no post_save
+    return len(pks)
+
+
+class ApprovalMixin:
+    """
+    Staff-only bulk approve/reject on a viewset. The body names the rows
+    either by {"ids": [...]} or by {"filter": {<field>: <value>}} over
+    approval_filter_fields.
+    """
+    approval_workflow = None
+    approval_filter_fields = ()
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, CanApproveBeneficiary])
+    def approve(self, request):
+        return self.bulk_transition(request, "approve")
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated, CanApproveBeneficiary])
+    def reject(self, request):
+        return self.bulk_transition(request, "reject")
+
+    def bulk_transition(self, request, action_name):
+        serializer = BulkApprovalSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = self.get_queryset()
+        if "ids" in serializer.validated_data:
+            queryset = queryset.filter(pk__in=serializer.validated_data["ids"])
+        else:
+            queryset = queryset.filter(**self.clean_approval_filter(serializer.validated_data["filter"]))
+            limit = BulkApprovalSerializer.max_rows()
+            if queryset.count() > limit:
+                raise ValidationError({"filter": f"Matches more than {limit} rows, narrow it down"})
+        updated = set_state(self.approval_workflow, queryset, action_name, request.user)
+        return Response({"updated": updated})
+
+    def clean_approval_filter(self, raw):
+        cleaned = {}
+        for name, value in raw.items():
+            if name not in self.approval_filter_fields:
+                raise ValidationError({"filter": f"Can filter on: {', '.join(self.approval_filter_fields)}"})
+            try:
+                field = self.approval_workflow.model._meta.get_field(name)
+                cleaned[field.attname] = field.to_python(value)
+            except (FieldDoesNotExist, DjangoValidationError):
+                raise ValidationError({"filter": f"Invalid value for {name}"})
+        return cleaned
@@ -0,0 +1,171 @@
+"""
+Archival of closed projects.
+
+A project whose end_date is more than AID_ARCHIVE_AFTER_DAYS in the past is
+closed. archive_project() moves its rows off the hot tables in one
+transaction:
+
+- donations into ArchivedDonation, same ids and columns, append-only with
+  one index, so ProjectStats.compute and backfill_rollups still count them;
+- volunteers and beneficiaries into a gzipped JSONL file in the default
+  storage, archives/project-<id>.jsonl.gz, one {"model", "fields"} per line;
+- a ProjectArchive row with the counts and the donation total.
+
+The project row, its ProjectStats and the daily rollups stay, so every
+total the API and analytics report is unchanged. The moved rows are deleted
+without signals for the same reason: nothing derived from them changes.
+Payment intents keep their tx_ref but no longer point at the donation.
+
+restore_project() puts everything back, first re-creating any monthly
+donation partitions (aid/partitions.py) dropped since.
+"""
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .cache import invalidate
+from .models import ArchivedDonation, Beneficiary, Donation, PaymentIntent, Project, ProjectArchive, Volunteer
+from .partitions import prepare_for
+
+ARCHIVE_NAME = "archives/project-{}.jsonl.gz"
+FILE_MODELS = {model._meta.label_lower: model for model in (Volunteer, Beneficiary)}
+BATCH_SIZE = 2000
+
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder rounds to milliseconds; a restore must be exact
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def closed_projects(today=None):
+    """
+    Projects that ended more than AID_ARCHIVE_AFTER_DAYS ago and are not archived yet.
+    """
+    cutoff = (today or timezone.localdate()) - timedelta(days=getattr(settings, "AID_ARCHIVE_AFTER_DAYS", 90))
+    return Project.objects.filter(end_date__lt=cutoff, archive__isnull=True)
+
+
+def write_file(project_id):
+    """
+    Save the project's volunteers and beneficiaries as gzipped JSONL.
+    Returns the storage name and {model: rows written}.
+    """
+    counts = {}
+    with tempfile.TemporaryFile() as buffer:
+        with gzip.GzipFile(fileobj=buffer, mode="wb") as out:
+            for label, model in FILE_MODELS.items():
+                counts[model] = 0
+                rows = model.objects.filter(project_id=project_id).order_by("pk").values()
+                for row in rows.iterator(chunk_size=BATCH_SIZE):
+                    out.write(json.dumps({"model": label, "fields": row}, cls=ArchiveEncoder).encode() + b"\n")
+                    counts[model] += 1
+        buffer.seek(0)
+        name = ARCHIVE_NAME.format(project_id)
+        if default_storage.exists(name):
+            default_storage.delete(name)  # left by an attempt that rolled back
+        return default_storage.save(name, File(buffer)), counts
+
+
+def read_file(name):
+    """
+    Yield (model, unsaved instance) for each line of an archive file.
+    """
+    with default_storage.open(name, "rb") as handle, gzip.GzipFile(fileobj=handle) as lines:
+        for line in lines:
+            record = json.loads(line)
+            model = FILE_MODELS[record["model"]]
+            fields = {key: model._meta.get_field(key).to_python(value) for key, value in record["fields"].items()}
+            yield model, model(**fields)
+
+
+def recreate(model, objs):
+    """
+    bulk_create objs with their ids and original auto_now_add dates.
+    """
+    stamped = [field.attname for field in model._meta.concrete_fields if getattr(field, "auto_now_add", False)]
+    dates = [[getattr(obj, name) for name in stamped] for obj in objs]
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if stamped:
+        # auto_now_add stamped "now" on create; write the archived dates back
+        for obj, values in zip(objs, dates):
+            for name, value in zip(stamped, values):
+                setattr(obj, name, value)
+        model.objects.bulk_update(objs, stamped, batch_size=BATCH_SIZE)
+
+
+def archive_project(project_id):
+    """
+    Archive one closed project. Returns the ProjectArchive, or None if it
+    already was archived.
+    """
+    with transaction.atomic():
+        Project.objects.select_for_update().get(pk=project_id)
+        if ProjectArchive.objects.filter(project_id=project_id).exists():
+            return None
+        name, counts = write_file(project_id)
+
+        donations = Donation.objects.filter(project_id=project_id)
+        totals = donations.aggregate(count=Count("id"), total=Sum("amount"))
+        batch = []
+        for row in donations.order_by("pk").values_list("id", "donor_id", "amount", "date").iterator(chunk_size=BATCH_SIZE):
+            batch.append(ArchivedDonation(id=row[0], project_id=project_id, donor_id=row[1], amount=row[2], date=row[3]))
+            if len(batch) >= BATCH_SIZE:
+                ArchivedDonation.objects.bulk_create(batch)
+                batch = []
+        ArchivedDonation.objects.bulk_create(batch)
+
+        # What on_delete=SET_NULL would do, without loading the donations
+        PaymentIntent.objects.filter(donation__project_id=project_id).update(donation=None)
+        # _raw_delete: one DELETE, no per-row signals undoing the totals
+        for queryset in (donations, Volunteer.objects.filter(project_id=project_id),
+                         Beneficiary.objects.filter(project_id=project_id)):
+            queryset._raw_delete(queryset.db)
+
+        archive = ProjectArchive.objects.create(
+            project_id=project_id,
+            file=name,
+            donation_count=totals["count"],
+            donation_total=totals["total"] or 0,
+            volunteer_count=counts[Volunteer],
+            beneficiary_count=counts[Beneficiary],
+        )
+        invalidate("volunteers", "beneficiaries")
+    return archive
+
+
+def restore_project(project_id):
+    """
+    Move an archived project's rows back to the hot tables.
+    """
+    with transaction.atomic():
+        archive = ProjectArchive.objects.select_for_update().get(project_id=project_id)
+        archived = ArchivedDonation.objects.filter(project_id=project_id)
+        prepare_for(archived.datetimes("date", "month", tzinfo=dt_timezone.utc))
+        donations = [
+            Donation(id=row.id, project_id=project_id, donor_id=row.donor_id, amount=row.amount, date=row.date)
+            for row in archived.iterator(chunk_size=BATCH_SIZE)
+        ]
+        recreate(Donation, donations)
+        archived._raw_delete(archived.db)
+
+        rows = {model: [] for model in FILE_MODELS.values()}
+        for model, obj in read_file(archive.file):
+            rows[model].append(obj)
+        for model, objs in rows.items():
+            recreate(model, objs)
+
+        archive.delete()
+        invalidate("volunteers", "beneficiaries")
+        transaction.on_commit(lambda: default_storage.delete(archive.file))
@@ -0,0 +1,187 @@
+"""
+Async versions of the read-heavy endpoints and of the M-Pesa donation, for
+serving under ASGI (e.g. uvicorn community_aid.asgi:application).
+
+Each view borrows the DRF viewset the sync API uses, so querysets,
+visibility rules, serializers and pagination live in one place; only the
+I/O differs. Queries run on the async ORM and the gateway call goes through
+an httpx AsyncClient, so one worker keeps serving other requests while a
+slow client or the gateway is being waited on. Requests authenticate with a
+JWT bearer token.
+"""
+import functools
+import json
+
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from .authentication import FastJWTAuthentication
+from .models import PaymentIntent, Project
+from .payments import InvalidDonation, ainitiate_payment, clean_donation, gateway_calls, new_tx_ref
+from .renderers import FastJSONRenderer
+from .replicas import replica_reads
+from .serializers import PaymentIntentSerializer
+from .throttling import DonateThrottle
+from .views import DonationViewSet, ProjectViewSet, VolunteerViewSet
+
+authenticator = FastJWTAuthentication()
+
+
+def api_view(view_func):
+    """
+    Turn DRF exceptions into JSON error responses, as DRF's own handler would.
+    """
+    @functools.wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view_func(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = JsonResponse(data, status=exc.status_code, safe=False)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+                response.status_code = 401
+            if getattr(exc, "wait", None):
+                response["Retry-After"] = "%d" % exc.wait
+            return response
+    return wrapper
+
+
+async def authenticate(request):
+    result = await authenticator.aauthenticate(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    return result[0]
+
+
+async def get_view(request, viewset_class, action, **kwargs):
+    """
+    A viewset instance set up for action on an authenticated, permitted request.
+    """
+    drf_request = Request(request, authenticators=())
+    drf_request.user = await authenticate(request)
+    view = viewset_class(request=drf_request, args=(), kwargs=kwargs, action=action, format_kwarg=None)
+    view.check_permissions(drf_request)
+    return view
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), content_type="application/json", status=status)
+
+
+async def list_response(request, viewset_class):
+    view = await get_view(request, viewset_class, "list")
+    with replica_reads(view.request.user):
+        queryset = view.filter_queryset(view.get_queryset())
+        fast = view.get_fast_list_plan() if hasattr(view, "get_fast_list_plan") else None
+        if fast is not None:
+            queryset = view.get_fast_list_queryset(fast[0], queryset)
+        page = await view.paginator.apaginate_queryset(queryset, view.request, view)
+        data = fast[0].render(page, fast[1]) if fast is not None else view.get_serializer(page, many=True).data
+    return json_response(view.paginator.get_paginated_response(data).data)
+
+
+async def detail_response(request, viewset_class, pk):
+    view = await get_view(request, viewset_class, "retrieve", pk=pk)
+    with replica_reads(view.request.user):
+        instance = await view.filter_queryset(view.get_queryset()).filter(pk=pk).afirst()
+    if instance is None:
+        raise exceptions.NotFound()
+    view.check_object_permissions(view.request, instance)
+    return json_response(view.get_serializer(instance).data)
+
+
+@require_GET
+@api_view
+async def project_list(request):
+    return await list_response(request, ProjectViewSet)
+
+
+@require_GET
+@api_view
+async def project_detail(request, pk):
+    return await detail_response(request, ProjectViewSet, pk)
+
+
+@require_GET
+@api_view
+async def donation_list(request):
+    return await list_response(request, DonationViewSet)
+
+
+@require_GET
+@api_view
+async def donation_detail(request, pk):
+    return await detail_response(request, DonationViewSet, pk)
+
+
+@require_GET
+@api_view
+async def volunteer_list(request):
+    return await list_response(request, VolunteerViewSet)
+
+
+@require_GET
+@api_view
+async def volunteer_detail(request, pk):
+    return await detail_response(request, VolunteerViewSet, pk)
+
+
+@csrf_exempt
+@require_POST
+@api_view
+async def mpesa_donate(request):
+    """
+    Like views.mpesa_donate, but the gateway call is awaited in the request:
+    the response already carries the payment link (status "initiated"), the
+    failure, or "unknown" if the gateway timed out. The webhook still settles
+    the donation.
+    """
+    user = await authenticate(request)
+    drf_request = Request(request, authenticators=())
+    drf_request.user = user
+    throttle = DonateThrottle()
+    if not await throttle.aallow_request(drf_request, None):
+        raise exceptions.Throttled(throttle.wait())
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        raise exceptions.ParseError()
+    if not isinstance(data, dict):
+        raise exceptions.ParseError()
+
+    try:
+        project_id, amount, phone, idempotency_key = clean_donation(data, request.headers.get("Idempotency-Key"))
+    except InvalidDonation as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if idempotency_key:
+        existing = await PaymentIntent.objects.filter(donor=user, idempotency_key=idempotency_key).afirst()
+        if existing is not None:
+            return JsonResponse(PaymentIntentSerializer(existing).data)
+
+    if not await Project.objects.filter(id=project_id).aexists():
+        return JsonResponse({"error": "Project not found"}, status=404)
+
+    # Refuse before recording anything if the gateway is already busy
+    with gateway_calls.slot():
+        try:
+            intent = await PaymentIntent.objects.acreate(
+                donor=user,
+                project_id=project_id,
+                amount=amount,
+                phone=phone,
+                tx_ref=new_tx_ref(user.id, project_id),
+                idempotency_key=idempotency_key,
+            )
+        except IntegrityError:
+            # Lost a race with a concurrent retry carrying the same key
+            intent = await PaymentIntent.objects.aget(donor=user, idempotency_key=idempotency_key)
+            return JsonResponse(PaymentIntentSerializer(intent).data)
+
+        intent = await ainitiate_payment(intent.pk)
+    return JsonResponse(PaymentIntentSerializer(intent).data, status=202)
@@ -1,21 +1,85 @@
-from django.contrib.auth.backends import ModelBackend
+"""
+Username/email + password authentication with a verified-credential cache.
+
+Every password check hashes with the configured hasher (PBKDF2, by design
+tens of milliseconds), and Basic authentication checks the password on
+every request. After a successful check, an HMAC of the (login, password)
+pair is remembered for AID_AUTH_CREDENTIAL_CACHE_TTL seconds in a
+per-process LRU of AID_AUTH_CREDENTIAL_CACHE_SIZE entries, next to the
+user's password hash at that moment. A repeat of the same pair is then
+accepted from memory while the user's current hash, read from the
+FastJWTAuthentication snapshot cache, is still the same one.
+
+Changing the password changes the hash, so the old pair stops working at
+once in this process (the User signals evict the snapshot) and within
+AID_JWT_USER_CACHE_TTL seconds elsewhere. Failed checks are never cached,
+and the cache holds digests keyed with SECRET_KEY, not passwords.
+"""
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.utils.crypto import salted_hmac
+
+from .authentication import LRUCache, cached_user, remember_user
 
 User = get_user_model()
 
+verified_credentials = LRUCache(
+    maxsize=getattr(settings, "AID_AUTH_CREDENTIAL_CACHE_SIZE", 1000),
+    ttl=getattr(settings, "AID_AUTH_CREDENTIAL_CACHE_TTL", 300),
+)
+
+
+def credential_key(login, password):
+    return salted_hmac("aid.auth_backends.credential", f"{login}\0{password}", algorithm="sha256").digest()
+
+
 class EmailBackend(ModelBackend):
     """
-    Authenticate using email instead of username.
+    Authenticate using email or username.
     """
 
     def authenticate(self, request, username=None, password=None, **kwargs):
-        # Here username is actually email
-        try:
-            user = User.objects.get(email=username)
-        except User.DoesNotExist:
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
             return None
 
-        if user.check_password(password):
-            return user
-        return None
+        key = credential_key(username, password)
+        cached = verified_credentials.get(key)
+        if cached is not None:
+            user_id, password_hash = cached
+            user = cached_user(user_id)
+            if user is not None and user.password == password_hash and self.user_can_authenticate(user):
+                return user
+            verified_credentials.delete(key)
+
+        users = self.find_users(username)
+        if not users:
+            # Take as long as a wrong password, like ModelBackend
+            User().set_password(password)
+        for user in users:
+            if user.check_password(password) and self.user_can_authenticate(user):
+                # check_password may have upgraded the stored hash, so read it after
+                verified_credentials.set(key, (user.pk, user.password))
+                remember_user(user)
+                return user
+        # This looked at both email and username: stop any later backend
+        # from querying and hashing all over again
+        raise PermissionDenied
 
+    def find_users(self, login):
+        """
+        The users whose email or username is login, in one query: at most
+        two, when one account's username is another's email. The email
+        match comes first, as it did when ModelBackend ran second, and the
+        password decides between them.
+        """
+        # Repeating the partial index condition lets every database use aid_user_email_uniq
+        matches = list(User.objects.filter(
+            Q(**{User.USERNAME_FIELD: login}) | (Q(email=login) & ~Q(email=""))
+        )[:2])
+        matches.sort(key=lambda user: user.email != login)
+        return matches
@@ -0,0 +1,156 @@
+"""
+JWT authentication without a per-request User query.
+
+simplejwt's JWTAuthentication loads the whole User row for every request.
+FastJWTAuthentication verifies the signed token as usual, then builds a
+ClaimsUser from a small per-process LRU of user snapshots (id, username,
+staff/superuser/active flags). The rest of the row is loaded only if a
+view touches another field.
+
+The role flags come from the snapshot, not from claims baked into the
+token, so deactivating or demoting a user takes effect at once: the User
+signals in aid/signals.py evict the snapshot. Entries also expire after
+AID_JWT_USER_CACHE_TTL seconds to pick up changes made by other processes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import ClaimsUser, User
+
+# In concrete field order, as Model.from_db expects. The password hash lets
+# aid.auth_backends check its cached credentials are still current.
+SNAPSHOT_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {"id", "password", "username", "is_staff", "is_superuser", "is_active"}
+)
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded mapping with per-entry expiry.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+user_snapshots = LRUCache(
+    maxsize=getattr(settings, "AID_JWT_USER_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "AID_JWT_USER_CACHE_TTL", 60),
+)
+
+
+def cached_user(user_id):
+    """
+    The user as a ClaimsUser built from its snapshot, or None if there is no such user.
+    """
+    snapshot = user_snapshots.get(user_id)
+    if snapshot is None:
+        snapshot = User.objects.filter(pk=user_id).values_list(*SNAPSHOT_FIELDS).first()
+        if snapshot is None:
+            return None
+        user_snapshots.set(user_id, snapshot)
+    return ClaimsUser.from_db(User.objects.db, SNAPSHOT_FIELDS, snapshot)
+
+
+def remember_user(user):
+    """
+    Snapshot a User just loaded in full, saving cached_user() its query.
+    """
+    user_snapshots.set(user.pk, tuple(getattr(user, name) for name in SNAPSHOT_FIELDS))
+
+
+def revoke_user(user_id):
+    """
+    Forget the cached snapshot so the next request re-reads the user.
+    """
+    user_snapshots.delete(user_id)
+
+
+class FastJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        snapshot = user_snapshots.get(user_id)
+        if snapshot is None:
+            snapshot = self.snapshot_query(user_id).first()
+            if snapshot is None:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            user_snapshots.set(user_id, snapshot)
+        return self.build_user(snapshot)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views (plain Django requests). Only a snapshot
+        cache miss touches the database, through the async ORM.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        snapshot = user_snapshots.get(user_id)
+        if snapshot is None:
+            snapshot = await self.snapshot_query(user_id).afirst()
+            if snapshot is None:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            user_snapshots.set(user_id, snapshot)
+        return self.build_user(snapshot)
+
+    def get_user_id(self, validated_token):
+        try:
+            return User._meta.pk.to_python(validated_token[jwt_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    def snapshot_query(self, user_id):
+        return User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}).values_list(*SNAPSHOT_FIELDS)
+
+    def build_user(self, snapshot):
+        user = ClaimsUser.from_db(User.objects.db, SNAPSHOT_FIELDS, snapshot)
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -0,0 +1,166 @@
+"""
+Helpers shared by the bench_* management commands: synthetic data
+seeding at configurable scale and simple latency measurement.
+
+Run them against a scratch database, never production.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from .models import User, Project, Donation, Beneficiary, Volunteer
+
+PROJECT_STATUSES = ["active", "planned", "completed", "paused"]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """
+    Let bulk_create keep the dates we generate instead of auto_now_add's "now".
+    """
+    previous = [(field, field.auto_now_add) for field in fields]
+    for field, _ in previous:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in previous:
+            field.auto_now_add = value
+
+
+def _chunked_create(model, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=batch_size)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def seed(users=1000, projects=100, donations=100000, volunteers=10000, beneficiaries=10000,
+         days=3 * 365, batch_size=5000, seed_value=42, log=None):
+    """
+    Insert synthetic rows with bulk_create, then rebuild the project aggregates
+    and rollups (bulk_create skips the Donation signals). Returns the created counts.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    password = make_password("bench-password")  # hash once, PBKDF2 per user would dominate
+    prefix = f"bench{int(time.time())}"
+
+    def recent():
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    log(f"Seeding {users} users")
+    _chunked_create(User, (
+        User(username=f"{prefix}_user{n}", email=f"{prefix}_user{n}@example.com", password=password)
+        for n in range(users)
+    ), batch_size)
+    user_ids = list(User.objects.filter(username__startswith=f"{prefix}_").values_list("id", flat=True))
+
+    log(f"Seeding {projects} projects")
+    _chunked_create(Project, (
+        Project(
+            title=f"{prefix} project {n}",
+            description="Synthetic benchmark project",
+            start_date=(now - timedelta(days=rng.randrange(days))).date(),
+            status=rng.choice(PROJECT_STATUSES),
+            created_by_id=rng.choice(user_ids),
+        )
+        for n in range(projects)
+    ), batch_size)
+    project_ids = list(Project.objects.filter(title__startswith=f"{prefix} ").values_list("id", flat=True))
+
+    log(f"Seeding {donations} donations")
+    with explicit_dates(Donation._meta.get_field("date")):
+        _chunked_create(Donation, (
+            Donation(
+                donor_id=rng.choice(user_ids),
+                project_id=rng.choice(project_ids),
+                amount=Decimal(rng.randrange(100, 100000)) / 100,
+                date=recent(),
+            )
+            for _ in range(donations)
+        ), batch_size)
+
+    log(f"Seeding {beneficiaries} beneficiaries")
+    _chunked_create(Beneficiary, (
+        Beneficiary(
+            project_id=rng.choice(project_ids),
+            name=f"Beneficiary {n}",
+            contact_info=f"+2547{n:08d}",
+            approved=rng.random() < 0.7,
+        )
+        for n in range(beneficiaries)
+    ), batch_size)
+
+    log(f"Seeding {volunteers} volunteers")
+    with explicit_dates(Volunteer._meta.get_field("date_joined")):
+        _chunked_create(Volunteer, (
+            Volunteer(
+                user_id=rng.choice(user_ids),
+                project_id=rng.choice(project_ids),
+                role="helper",
+                status=rng.choice(["pending", "approved", "approved", "rejected"]),
+                date_joined=recent(),
+            )
+            for _ in range(volunteers)
+        ), batch_size)
+
+    log("Rebuilding project aggregates and daily rollups")
+    call_command("rebuild_project_stats", project=project_ids, stdout=_NullWriter())
+    call_command("backfill_rollups", stdout=_NullWriter())
+    return {
+        "users": len(user_ids), "projects": len(project_ids), "donations": donations,
+        "beneficiaries": beneficiaries, "volunteers": volunteers,
+    }
+
+
+class _NullWriter:
+    def write(self, *args, **kwargs):
+        pass
+
+    def flush(self):
+        pass
+
+
+def time_call(func, repeat=5):
+    """
+    Run func `repeat` times and return the latencies in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "median_ms": round(statistics.median(samples), 3) if samples else 0.0,
+        "p95_ms": round(percentile(samples, 95), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+    }
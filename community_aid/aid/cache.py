@@ -0,0 +1,176 @@
+"""
+Read-through response cache for the read-mostly list/retrieve endpoints.
+
+Every cache group (projects, beneficiaries, volunteers) has a generation
+token. Entries are keyed by the ETag, which hashes the generation with the
+request path and the viewer's visibility variant. Changing any row in the
+group replaces the token (see aid/signals.py), so old entries are never
+served again and simply expire. A matching If-None-Match gets a 304 after
+one cache lookup and no database work.
+
+Reads served from a replica (aid/replicas.py) are not stored while the
+group's generation is younger than AID_DB_STICKY_SECONDS: the replica may
+not have the change yet, and the stale page would be cached under the new
+generation.
+
+?expand= embeds other models, so those responses also hash the generations
+of the expanded serializers' groups (Meta.cache_group). A response that
+would embed a serializer without one is not cached at all.
+
+Every donation rewrites its project's ProjectStats row, which would empty
+the projects group on each one. Those writes go through invalidate_later()
+instead: at most one bump per AID_STATS_INVALIDATE_SECONDS, and the first
+read after the window picks up anything that changed inside it.
+
+The backend is the CACHES alias named by AID_RESPONSE_CACHE_ALIAS.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .replicas import reading_replica
+from .sparse import parse_paths
+
+GENERATION_KEY = "aid:gen:{}"
+RESPONSE_KEY = "aid:resp:{}"
+HOLD_KEY = "aid:hold:{}"  # present while invalidate_later() holds off bumping
+DIRTY_KEY = "aid:dirty:{}"  # changed during the hold; the value is the hold length
+
+
+def get_cache():
+    return caches[getattr(settings, "AID_RESPONSE_CACHE_ALIAS", "default")]
+
+
+def generation(group):
+    cache = get_cache()
+    key, dirty = GENERATION_KEY.format(group), DIRTY_KEY.format(group)
+    found = cache.get_many([key, dirty])
+    if dirty in found and cache.add(HOLD_KEY.format(group), 1, timeout=found[dirty]):
+        # The hold is over and changes are waiting: bump, and hold again
+        cache.delete(dirty)
+        _bump(group)
+        found.pop(key, None)
+    token = found.get(key)
+    if token is None:
+        cache.add(key, new_token(), timeout=None)
+        token = cache.get(key)
+    return token
+
+
+def new_token():
+    return f"{time.time():.3f}:{uuid.uuid4().hex}"
+
+
+def generation_age(group):
+    """
+    Seconds since the group was last invalidated.
+    """
+    created, _, _ = generation(group).partition(":")
+    try:
+        return time.time() - float(created)
+    except ValueError:  # a token from before timestamps were added
+        return float("inf")
+
+
+def _bump(group):
+    get_cache().set(GENERATION_KEY.format(group), new_token(), timeout=None)
+
+
+def invalidate(*groups):
+    """
+    Drop every cached response of the given groups. Bumped now and again on
+    commit, so a reader that saw the old rows mid-transaction can't pin them.
+    """
+    for group in groups:
+        _bump(group)
+        transaction.on_commit(lambda group=group: _bump(group))
+
+
+def invalidate_later(group, seconds):
+    """
+    invalidate() for a group that changes all the time: bump it at most once
+    every `seconds`. Changes inside that window only mark the group, so its
+    cached responses trail the database by `seconds` at most.
+    """
+    if seconds <= 0 or get_cache().add(HOLD_KEY.format(group), 1, timeout=seconds):
+        invalidate(group)
+    else:
+        transaction.on_commit(lambda: get_cache().set(DIRTY_KEY.format(group), seconds, timeout=None))
+
+
+def make_etag(groups, variant, path):
+    tokens = "|".join(f"{group}:{generation(group)}" for group in sorted(groups))
+    raw = f"{tokens}|{variant}|{path}"
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+
+class CachedResponseMixin:
+    """
+    Caches the rendered data of list (and optionally retrieve) responses.
+
+    Views set cache_group and may override get_cache_variant(): return a
+    string naming what this viewer is allowed to see, or None to bypass
+    the cache for the request.
+    """
+    cache_group = None
+    cache_actions = ("list", "retrieve")
+
+    def get_cache_variant(self):
+        return "all"
+
+    def get_cache_groups(self):
+        """
+        The view's group and those of the relations ?expand= embeds, or None
+        if one of them has no group to invalidate it.
+        """
+        groups = {self.cache_group}
+        pending = [(self.get_serializer_class(), parse_paths(self.request.query_params.get("expand")))]
+        while pending:
+            serializer_class, tree = pending.pop()
+            expandable = getattr(serializer_class.Meta, "expandable_fields", {})
+            for name, subtree in tree.items():
+                if name not in expandable:
+                    continue  # the serializer rejects it with a 400, which is never cached
+                nested = expandable[name]
+                group = getattr(nested.Meta, "cache_group", None)
+                if group is None:
+                    return None
+                groups.add(group)
+                pending.append((nested, subtree))
+        return groups
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        variant = self.get_cache_variant() if self.action in self.cache_actions else None
+        groups = self.get_cache_groups() if variant is not None else None
+        if groups is None:
+            return handler(request, *args, **kwargs)
+
+        etag = make_etag(groups, variant, request.get_full_path())
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=304, headers=headers)
+
+        cache = get_cache()
+        data = cache.get(RESPONSE_KEY.format(etag))
+        if data is not None:
+            return Response(data, headers=headers)
+
+        response = handler(request, *args, **kwargs)
+        sticky = getattr(settings, "AID_DB_STICKY_SECONDS", 5)
+        fresh = not reading_replica() or min(generation_age(group) for group in groups) >= sticky
+        if response.status_code == 200 and fresh:
+            cache.set(RESPONSE_KEY.format(etag), response.data, getattr(settings, "AID_RESPONSE_CACHE_TIMEOUT", 300))
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,204 @@
+"""
+Read-only fast path for large list responses.
+
+DRF builds every row by walking the serializer's fields and calling
+get_attribute()/to_representation() on a model instance, which dominates
+the time of a thousand-row page. FastListMixin instead compiles the
+serializer once into a plan of (name, column, converter) and fills each
+row's dict straight from values_list() tuples: no model instances, no
+per-row field lookups. Converters are the serializer's own fields'
+to_representation, so the JSON is the same as the serializer's.
+
+A serializer whose fields can't be read from columns (nested serializers,
+method fields without a Meta.fast_fields entry, dotted sources, model
+properties) simply takes the normal path. Serializers may name fields to send as null for
+this viewer with hidden_fields(), e.g. amounts for non-admins.
+
+Datetimes and decimals, the costly conversions, get converters that
+resolve the timezone and decimal context once per response instead of once
+per value; their output is the same as DRF's.
+"""
+import decimal
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField, SlugRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+# Fields whose to_representation returns the database value unchanged
+PASSTHROUGH = (
+    serializers.BooleanField, serializers.CharField, serializers.IntegerField, serializers.ReadOnlyField,
+)
+# Fields whose to_representation only depends on the value (not on the request)
+CONVERTED = (
+    serializers.ChoiceField, serializers.DateField, serializers.DateTimeField, serializers.DecimalField,
+    serializers.DurationField, serializers.FloatField, serializers.TimeField, serializers.UUIDField,
+)
+
+_plans = {}
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation with the timezone looked up once.
+    """
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if tz is None or getattr(field, "format", api_settings.DATETIME_FORMAT) != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    return convert
+
+
+def decimal_converter(field):
+    """
+    DecimalField.to_representation with the quantizing context built once.
+    """
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if field.decimal_places is None or field.normalize_output or field.localize or not coerce_to_string:
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return "{:f}".format(value.quantize(exponent, rounding=field.rounding, context=context))
+    return convert
+
+
+# Builders of converters for a response; anything else uses to_representation
+CONVERTERS = {
+    serializers.DateTimeField: datetime_converter,
+    serializers.DecimalField: decimal_converter,
+}
+
+
+def is_column(model, name):
+    if name == "pk":
+        return True
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and not field.many_to_many
+
+
+class FastListPlan:
+    """
+    How to read one serializer's fields from a values_list() row.
+    """
+    def __init__(self, columns, lookups):
+        self.columns = columns  # [(name, index into the row, converter builder or None)]
+        self.lookups = lookups
+
+    @classmethod
+    def compile(cls, serializer):
+        """
+        The plan for serializer, or None if it can't be served from columns.
+        """
+        overrides = getattr(serializer.Meta, "fast_fields", {})
+        lookups, columns = ["pk"], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            build = None
+            if name in overrides:
+                lookup, convert = overrides[name]
+                build = lambda convert=convert: convert
+            elif isinstance(field, SlugRelatedField):
+                lookup = f"{field.source}__{field.slug_field}"
+            elif isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+                lookup = field.source
+            elif field.source == "*" or "." in field.source:
+                return None
+            elif not is_column(serializer.Meta.model, field.source):
+                return None  # a property or method of the model
+            elif isinstance(field, PASSTHROUGH) and not isinstance(field, CONVERTED):
+                lookup = field.source
+            elif isinstance(field, CONVERTED):
+                lookup = field.source
+                builder = CONVERTERS.get(type(field))
+                build = functools.partial(builder, field) if builder else lambda field=field: field.to_representation
+            else:
+                return None
+            if lookup not in lookups:
+                lookups.append(lookup)
+            columns.append((name, lookups.index(lookup), build))
+        return cls(columns, lookups)
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        # ?expand= swaps a field for a nested serializer under the same name
+        key = (type(serializer), tuple((name, type(field), field.source) for name, field in serializer.fields.items()))
+        if key not in _plans:
+            _plans[key] = cls.compile(serializer)
+        return _plans[key]
+
+    def rows(self, queryset, *extra):
+        """
+        queryset as named tuples of the plan's columns (plus extra, e.g. a pagination key).
+        """
+        lookups = self.lookups + [name for name in extra if name not in self.lookups]
+        return queryset.values_list(*lookups, named=True)
+
+    def render(self, rows, hidden=()):
+        columns = [
+            (name, None if name in hidden else index, build() if build else None)
+            for name, index, build in self.columns
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, index, convert in columns:
+                if index is None:
+                    item[name] = None
+                    continue
+                value = row[index]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+class FastListMixin:
+    """
+    Viewset mixin: serve list responses through FastListPlan when the
+    serializer allows it. Set fast_list = False to always use the serializer.
+    """
+    fast_list = True
+
+    def get_fast_list_plan(self):
+        """
+        (plan, names of fields to send as null), or None to use the serializer.
+        """
+        if not self.fast_list:
+            return None
+        serializer = self.get_serializer()
+        plan = FastListPlan.for_serializer(serializer)
+        if plan is None:
+            return None
+        return plan, serializer.hidden_fields() if hasattr(serializer, "hidden_fields") else set()
+
+    def get_fast_list_queryset(self, plan, queryset):
+        # Keyset pagination reads its ordering column off the last row
+        ordering = getattr(self.paginator, "ordering_field", None)
+        return plan.rows(queryset, *([ordering] if ordering else []))
+
+    def list(self, request, *args, **kwargs):
+        fast = self.get_fast_list_plan()
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+        plan, hidden = fast
+        rows = self.get_fast_list_queryset(plan, self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(plan.render(rows, hidden))
+        return self.get_paginated_response(plan.render(page, hidden))
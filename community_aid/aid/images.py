@@ -0,0 +1,155 @@
+"""
+Profile photo pipeline.
+
+process_upload() checks an upload is a real, reasonably sized image,
+applies its EXIF rotation, downscales it to PHOTO_MAX_EDGE and re-encodes
+it as a metadata-free JPEG named after its content hash
+(profiles/<hash>.jpg). Identical uploads share one file, and a name never
+changes meaning, so everything under profiles/ can be cached forever.
+
+Thumbnails are derived from that hash: profiles/variants/<hash>-<size>.<ext>
+for every size in VARIANT_SIZES, in WebP and JPEG. generate_variants() runs
+as a background job after each upload. A variant that is still missing is
+built on first request by views.photo_variant; in production the web
+server serves MEDIA_ROOT directly and only falls back to Django on a miss.
+"""
+import hashlib
+import io
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+PHOTO_DIR = "profiles"
+VARIANT_DIR = "profiles/variants"
+PHOTO_MAX_BYTES = getattr(settings, "AID_PHOTO_MAX_BYTES", 10 * 1024 * 1024)
+PHOTO_MAX_PIXELS = getattr(settings, "AID_PHOTO_MAX_PIXELS", 40_000_000)  # refuse decompression bombs early
+PHOTO_MAX_EDGE = getattr(settings, "AID_PHOTO_MAX_EDGE", 1024)
+VARIANT_SIZES = {"small": 64, "medium": 256}
+VARIANT_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+
+VARIANT_NAME = re.compile(r"^(?P<digest>[0-9a-f]{32})-(?P<size>[a-z]+)\.(?P<ext>[a-z]+)$")
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def open_image(source, max_edge):
+    """
+    Decode source, at reduced resolution where the codec allows, upright and in RGB.
+    """
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError:
+        # Pillow's own limit, far past ours, trips while reading the header
+        raise InvalidImage(f"Images may have at most {PHOTO_MAX_PIXELS} pixels")
+    except (UnidentifiedImageError, OSError):
+        raise InvalidImage("Upload a JPEG, PNG, WebP or GIF image")
+    if image.format not in ACCEPTED_FORMATS:
+        raise InvalidImage("Upload a JPEG, PNG, WebP or GIF image")
+    width, height = image.size
+    if width * height > PHOTO_MAX_PIXELS:
+        raise InvalidImage(f"Images may have at most {PHOTO_MAX_PIXELS} pixels")
+
+    # JPEG can decode straight to 1/2, 1/4 or 1/8 scale, skipping most of the work
+    image.draft("RGB", (max_edge, max_edge))
+    try:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise InvalidImage("The image could not be decoded")
+    return image
+
+
+def encode(image, fmt, quality=85):
+    buffer = io.BytesIO()
+    options = {"quality": quality}
+    if fmt == "JPEG":
+        options.update(optimize=True, progressive=True)
+    elif fmt == "WEBP":
+        options["method"] = 4
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def process_upload(upload):
+    """
+    Validate and normalise an uploaded photo. Returns the storage name to
+    put in User.profile_photo; the file is written if it is new.
+    """
+    if upload.size > PHOTO_MAX_BYTES:
+        raise InvalidImage(f"Images may be at most {PHOTO_MAX_BYTES // (1024 * 1024)} MB")
+    data = encode(open_image(upload, PHOTO_MAX_EDGE), "JPEG")
+    name = f"{PHOTO_DIR}/{hashlib.sha256(data).hexdigest()[:32]}.jpg"
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def photo_digest(name):
+    """
+    The content hash of a processed photo, or None for a legacy upload.
+    """
+    match = re.fullmatch(rf"{PHOTO_DIR}/([0-9a-f]{{32}})\.jpg", name or "")
+    return match.group(1) if match else None
+
+
+def variant_name(digest, size, ext):
+    return f"{VARIANT_DIR}/{digest}-{size}.{ext}"
+
+
+def variant_urls(name):
+    """
+    {size: {ext: url}} for a processed photo; no storage access.
+    """
+    digest = photo_digest(name)
+    if digest is None:
+        return {}
+    return {
+        size: {ext: default_storage.url(variant_name(digest, size, ext)) for ext in VARIANT_FORMATS}
+        for size in VARIANT_SIZES
+    }
+
+
+def photo_urls(name):
+    """
+    The original's URL plus variant_urls(), or None without a photo.
+    """
+    if not name:
+        return None
+    return {"original": default_storage.url(name), **variant_urls(name)}
+
+
+def build_variant(digest, size, ext):
+    """
+    Write one variant from its original unless it already exists. Returns its name.
+    """
+    name = variant_name(digest, size, ext)
+    if not default_storage.exists(name):
+        with default_storage.open(f"{PHOTO_DIR}/{digest}.jpg", "rb") as original:
+            image = open_image(original, VARIANT_SIZES[size])
+        default_storage.save(name, ContentFile(encode(image, VARIANT_FORMATS[ext], quality=80)))
+    return name
+
+
+def generate_variants(name):
+    """
+    Background job: every size and format of the photo stored as name.
+    """
+    digest = photo_digest(name)
+    if digest is None:
+        return
+    for size in VARIANT_SIZES:
+        for ext in VARIANT_FORMATS:
+            build_variant(digest, size, ext)
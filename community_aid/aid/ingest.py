@@ -0,0 +1,166 @@
+"""
+Streaming bulk import of donations from CSV or JSONL.
+
+Rows are read one at a time and handled in fixed-size chunks: donor
+usernames and project titles are resolved with one query each per chunk,
+valid rows are written with bulk_create inside a transaction, and
+failures are collected into a bounded report. Memory use depends on the
+chunk size, not on the size of the input.
+
+Columns / keys: donor (username), project (title), amount, date (optional, ISO 8601).
+"""
+import csv
+import json
+from decimal import Decimal
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Donation, Project, User
+from .signals import donations_bulk_created
+
+FORMATS = ("csv", "jsonl")
+MAX_REPORTED_ERRORS = 1000
+
+
+class IngestError(ValueError):
+    def __init__(self, message, line=None):
+        super().__init__(message)
+        self.line = line
+
+
+def detect_format(name, declared=None):
+    fmt = (declared or "").lower() or name.rsplit(".", 1)[-1].lower()
+    if fmt in ("ndjson", "json"):
+        fmt = "jsonl"
+    if fmt not in FORMATS:
+        raise IngestError(f"Unsupported format '{fmt}', expected one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def decode_lines(binary_stream):
+    """
+    The stream's lines as text, decoded one at a time so a bad byte is
+    reported on its own line.
+    """
+    for line_number, line in enumerate(binary_stream, start=1):
+        try:
+            yield line.decode("utf-8-sig" if line_number == 1 else "utf-8")
+        except UnicodeDecodeError:
+            raise IngestError("Line is not UTF-8 text", line=line_number)
+
+
+def iter_rows(binary_stream, fmt):
+    """
+    Yield (line_number, dict) pairs from a binary file object without reading it all.
+    Raises IngestError, with its line, when the rest of the file can't be read.
+    """
+    text = decode_lines(binary_stream)
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        except csv.Error as e:
+            # DictReader.line_num only moves on after a good row
+            raise IngestError(f"Malformed CSV: {e}", line=reader.reader.line_num)
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else {"__invalid__": "Line is not a JSON object"}
+
+
+class DonationImporter:
+    amount_field = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal("0.01"))
+    date_field = serializers.DateTimeField()
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def report(self):
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def run(self, rows):
+        chunk = []
+        try:
+            for item in rows:
+                chunk.append(item)
+                if len(chunk) >= self.chunk_size:
+                    self.import_chunk(chunk)
+                    chunk = []
+        except IngestError as e:
+            # The rows before it still count; nothing after it can be read
+            self.error(e.line, str(e))
+        if chunk:
+            self.import_chunk(chunk)
+        return self.report()
+
+    def resolve(self, chunk):
+        usernames = {str(row.get("donor", "")).strip() for _, row in chunk}
+        titles = {str(row.get("project", "")).strip() for _, row in chunk}
+        donors = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+        projects = {}
+        for project_id, title in Project.objects.filter(title__in=titles).values_list("id", "title"):
+            # Titles are not unique; a duplicated title cannot identify a project
+            projects[title] = None if title in projects else project_id
+        return donors, projects
+
+    def import_chunk(self, chunk):
+        donors, projects = self.resolve(chunk)
+        donations, dates = [], []
+        for line, row in chunk:
+            if "__invalid__" in row:
+                self.error(line, row["__invalid__"])
+                continue
+            donor = str(row.get("donor", "")).strip()
+            title = str(row.get("project", "")).strip()
+            if donor not in donors:
+                self.error(line, f"Unknown donor '{donor}'")
+                continue
+            if title not in projects:
+                self.error(line, f"Unknown project '{title}'")
+                continue
+            if projects[title] is None:
+                self.error(line, f"Project title '{title}' is ambiguous")
+                continue
+            try:
+                amount = self.amount_field.run_validation(row.get("amount"))
+                date = self.date_field.run_validation(row["date"]) if row.get("date") else None
+            except serializers.ValidationError as e:
+                self.error(line, "; ".join(str(detail) for detail in e.detail))
+                continue
+            donations.append(Donation(donor_id=donors[donor], project_id=projects[title], amount=amount))
+            dates.append(date)
+
+        if not donations:
+            return
+        with transaction.atomic():
+            Donation.objects.bulk_create(donations)
+            # auto_now_add stamps "now" on create; bulk_update writes reconciled dates as given
+            dated = []
+            for donation, date in zip(donations, dates):
+                if date is not None:
+                    donation.date = date
+                    dated.append(donation)
+            if dated:
+                Donation.objects.bulk_update(dated, ["date"])
+            donations_bulk_created.send(sender=Donation, donations=donations)
+        self.created += len(donations)
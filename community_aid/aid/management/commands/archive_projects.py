@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from aid.archive import archive_project, closed_projects, restore_project
+from aid.models import ProjectArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the donations, volunteers and beneficiaries of closed projects (end_date more than "
+        "AID_ARCHIVE_AFTER_DAYS ago) off the hot tables, one project per transaction. "
+        "Totals stay queryable; --restore puts a project back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, action="append", help="Limit to this project id (repeatable).")
+        parser.add_argument("--today", help="Judge closed projects as of this day (YYYY-MM-DD).")
+        parser.add_argument("--dry-run", action="store_true", help="Only list the projects that would be archived.")
+        parser.add_argument("--restore", type=int, action="append", metavar="PROJECT", help="Restore this archived project.")
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            for project_id in options["restore"]:
+                if not ProjectArchive.objects.filter(project_id=project_id).exists():
+                    raise CommandError(f"Project {project_id} is not archived.")
+                restore_project(project_id)
+                self.stdout.write(f"Restored project {project_id}")
+            return
+
+        today = None
+        if options["today"]:
+            today = parse_date(options["today"])
+            if today is None:
+                raise CommandError(f"Invalid date '{options['today']}'")
+        projects = closed_projects(today).order_by("id")
+        if options["project"]:
+            projects = projects.filter(id__in=options["project"])
+
+        archived = 0
+        for project_id, title in projects.values_list("id", "title"):
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive project {project_id} ({title})")
+                continue
+            archive = archive_project(project_id)
+            if archive is None:
+                continue
+            archived += 1
+            self.stdout.write(
+                f"Archived project {project_id} ({title}): {archive.donation_count} donations, "
+                f"{archive.volunteer_count} volunteers, {archive.beneficiary_count} beneficiaries -> {archive.file}"
+            )
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Archived {archived} project(s)."))
@@ -0,0 +1,78 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from aid.models import ArchivedDonation, DailyDonorDonations, DailyProjectDonations, Donation
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily donation rollups from the donations table (and archived "
+        "donations), one month per transaction. Defaults to the whole history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--end", help="Last day to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        both = [model.objects.aggregate(first=Min("date"), last=Max("date")) for model in (Donation, ArchivedDonation)]
+        bounds = {
+            "first": min(filter(None, (b["first"] for b in both)), default=None),
+            "last": max(filter(None, (b["last"] for b in both)), default=None),
+        }
+        if bounds["first"] is None:
+            self.stdout.write("No donations, nothing to backfill.")
+            return
+        start = self.day(options["start"]) or timezone.localdate(bounds["first"])
+        end = self.day(options["end"]) or timezone.localdate(bounds["last"])
+
+        month = start.replace(day=1)
+        while month <= end:
+            following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+            first, last = max(month, start), min(following - timedelta(days=1), end)
+            self.rebuild(first, last)
+            self.stdout.write(f"Rebuilt {first} .. {last}")
+            month = following
+        self.stdout.write(self.style.SUCCESS("Rollups backfilled."))
+
+    def day(self, value):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Invalid date '{value}'")
+        return day
+
+    def rebuild(self, first, last):
+        lower = timezone.make_aware(datetime.combine(first, time.min))
+        upper = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min))
+        # Archived projects' donations (aid/archive.py) still count
+        sources = [
+            model.objects.filter(date__gte=lower, date__lt=upper).annotate(day=TruncDate("date"))
+            for model in (Donation, ArchivedDonation)
+        ]
+
+        with transaction.atomic():
+            for rollup in (DailyProjectDonations, DailyDonorDonations):
+                rollup.objects.filter(day__range=(first, last)).delete()
+                rows = {}
+                for donations in sources:
+                    grouped = (
+                        donations.values(rollup.key_field, "day")
+                        .annotate(total_amount=Sum("amount"), donation_count=Count("id"))
+                        .order_by()
+                    )
+                    for row in grouped.iterator():
+                        key = (row[rollup.key_field], row["day"])
+                        if key in rows:
+                            rows[key]["total_amount"] += row["total_amount"]
+                            rows[key]["donation_count"] += row["donation_count"]
+                        else:
+                            rows[key] = row
+                rollup.objects.bulk_create((rollup(**row) for row in rows.values()), batch_size=2000)
@@ -0,0 +1,201 @@
+import json
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from aid.benchmarks import percentile, seed
+from aid.models import User
+from aid.urls import router
+
+BENCH_USERNAME = "bench-admin"
+BENCH_PASSWORD = "bench-admin-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test every router endpoint plus /api/token/ with concurrent clients and report "
+        "p50/p95/p99 latency, throughput and queries per request as JSON. Runs in-process over "
+        "WSGI (offline, against the configured database) or against --base-url, which should "
+        "run with AID_THROTTLE_DISABLED=1 so the rate limits don't answer most requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="Seed synthetic data first (see --users etc).")
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--projects", type=int, default=100)
+        parser.add_argument("--donations", type=int, default=100000)
+        parser.add_argument("--volunteers", type=int, default=10000)
+        parser.add_argument("--beneficiaries", type=int, default=10000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--base-url", help="Drive a running server instead of the in-process WSGI handler.")
+        parser.add_argument("--output", default="bench_api.json", help="Where to write the results.")
+        parser.add_argument("--compare", help="Earlier results file to diff against.")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            seed(
+                users=options["users"], projects=options["projects"], donations=options["donations"],
+                volunteers=options["volunteers"], beneficiaries=options["beneficiaries"],
+                log=self.stdout.write,
+            )
+        if connection.vendor == "sqlite" and settings.DATABASES["default"]["NAME"] == ":memory:":
+            raise CommandError("An in-memory SQLite database cannot be shared between client threads.")
+
+        admin = User.objects.filter(username=BENCH_USERNAME).first()
+        if admin is None:
+            admin = User.objects.create_superuser(BENCH_USERNAME, "", BENCH_PASSWORD)
+
+        self.base_url = (options["base_url"] or "").rstrip("/")
+        self.local = threading.local()
+        access = self.login()
+
+        results = {
+            "meta": {
+                "timestamp": timezone.now().isoformat(),
+                "commit": self.git_commit(),
+                "vendor": connection.vendor,
+                "mode": "http" if self.base_url else "wsgi",
+                "concurrency": options["concurrency"],
+                "requests_per_endpoint": options["requests"],
+                "rows": self.row_counts(),
+            },
+            "endpoints": {},
+        }
+        for name, method, path, body in self.endpoints():
+            auth = None if name == "token" else access
+            # Time the endpoints, not the login and donation rate limits
+            with override_settings(AID_THROTTLE_RATES={}):
+                stats = self.drive(method, path, body, auth, options["concurrency"], options["requests"])
+            results["endpoints"][name] = stats
+            self.stdout.write(
+                f"{name:28} p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  "
+                f"{stats['throughput_rps']:>8} req/s  q/req {stats['queries_per_request']}  errors {stats['errors']}"
+            )
+
+        with open(options["output"], "w") as handle:
+            json.dump(results, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def endpoints(self):
+        """
+        (name, method, path, body) for every router list and detail route, the
+        project stats action and the token endpoint.
+        """
+        out = [("token", "post", "/api/token/", {"username": BENCH_USERNAME, "password": BENCH_PASSWORD})]
+        for prefix, viewset, basename in router.registry:
+            if getattr(viewset, "queryset", None) is None:
+                # Action-only viewsets (analytics): drive each GET collection action
+                for extra in viewset.get_extra_actions():
+                    if not extra.detail and "get" in extra.mapping:
+                        out.append((f"{prefix}-{extra.url_path}", "get", f"/api/{prefix}/{extra.url_path}/", None))
+                continue
+            out.append((f"{prefix}-list", "get", f"/api/{prefix}/", None))
+            pk = viewset.queryset.model.objects.order_by("-pk").values_list("pk", flat=True).first()
+            if pk is not None:
+                out.append((f"{prefix}-detail", "get", f"/api/{prefix}/{pk}/", None))
+                if prefix == "projects":
+                    out.append(("projects-stats", "get", f"/api/projects/{pk}/stats/", None))
+        return out
+
+    def client(self):
+        if not hasattr(self.local, "client"):
+            if self.base_url:
+                import requests
+                self.local.client = requests.Session()
+            else:
+                self.local.client = Client(HTTP_HOST="localhost")
+        return self.local.client
+
+    def request(self, method, path, body, auth):
+        headers = {"Authorization": f"Bearer {auth}"} if auth else {}
+        client = self.client()
+        if self.base_url:
+            response = client.request(method, self.base_url + path, json=body, headers=headers, timeout=60)
+            return response.status_code, response
+        response = getattr(client, method)(path, data=body, content_type="application/json", headers=headers)
+        return response.status_code, response
+
+    def login(self):
+        status, response = self.request("post", "/api/token/", {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}, None)
+        if status != 200:
+            raise CommandError(f"Could not obtain a token for {BENCH_USERNAME} (HTTP {status}).")
+        return response.json()["access"]
+
+    def one(self, method, path, body, auth):
+        if self.base_url:
+            start = time.perf_counter()
+            status, _ = self.request(method, path, body, auth)
+            return (time.perf_counter() - start) * 1000, status, None
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            status, _ = self.request(method, path, body, auth)
+            elapsed = (time.perf_counter() - start) * 1000
+        return elapsed, status, len(queries)
+
+    def drive(self, method, path, body, auth, concurrency, count):
+        def worker(_):
+            try:
+                return self.one(method, path, body, auth)
+            finally:
+                if not self.base_url:
+                    connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(worker, range(count)))
+        wall = time.perf_counter() - started
+
+        latencies = [s[0] for s in samples]
+        queries = [s[2] for s in samples if s[2] is not None]
+        return {
+            "method": method.upper(),
+            "path": path,
+            "requests": count,
+            "errors": sum(1 for s in samples if s[1] >= 400),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "throughput_rps": round(count / wall, 1),
+            "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    def row_counts(self):
+        return {
+            prefix: viewset.queryset.model.objects.count()
+            for prefix, viewset, _ in router.registry if getattr(viewset, "queryset", None) is not None
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def compare(self, path, current):
+        with open(path) as handle:
+            previous = json.load(handle)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {path} ({previous['meta'].get('commit')})"))
+        for name, stats in current["endpoints"].items():
+            before = previous["endpoints"].get(name)
+            if before is None:
+                continue
+            change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+            self.stdout.write(
+                f"{name:28} p95 {before['p95_ms']:>8} -> {stats['p95_ms']:>8} ms ({change:+.1f}%)  "
+                f"req/s {before['throughput_rps']} -> {stats['throughput_rps']}"
+            )
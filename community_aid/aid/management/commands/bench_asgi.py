@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from aid.benchmarks import percentile, seed
+from aid.models import Donation, Project, User, Volunteer
+
+BENCH_USERNAME = "bench-admin"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync API under WSGI (gunicorn) with the /api/async/ views "
+        "under ASGI (uvicorn) at high concurrency. Starts both servers against the configured "
+        "database unless --wsgi-url/--asgi-url point at running ones. Response caching and rate "
+        "limits are switched off in spawned servers so both sides do the same work."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="Seed synthetic data first.")
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--projects", type=int, default=100)
+        parser.add_argument("--donations", type=int, default=100000)
+        parser.add_argument("--volunteers", type=int, default=10000)
+        parser.add_argument("--beneficiaries", type=int, default=1000)
+        parser.add_argument("--wsgi-url", help="A running WSGI server (skips spawning gunicorn).")
+        parser.add_argument("--asgi-url", help="A running ASGI server (skips spawning uvicorn).")
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes per spawned server.")
+        parser.add_argument("--threads", type=int, default=4, help="Threads per gunicorn worker.")
+        parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight at once.")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and server.")
+        parser.add_argument(
+            "--donate", action="store_true",
+            help="Also post donations; FLUTTERWAVE_BASE_URL must point at run_stub_gateway.",
+        )
+        parser.add_argument("--output", default="bench_asgi.json", help="Where to write the results.")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            seed(
+                users=options["users"], projects=options["projects"], donations=options["donations"],
+                volunteers=options["volunteers"], beneficiaries=options["beneficiaries"],
+                log=self.stdout.write,
+            )
+        if connection.vendor == "sqlite" and settings.DATABASES["default"]["NAME"] == ":memory:":
+            raise CommandError("The servers need a database they can share; an in-memory SQLite one is not.")
+
+        admin = User.objects.filter(username=BENCH_USERNAME).first()
+        if admin is None:
+            admin = User.objects.create_superuser(BENCH_USERNAME, "", "bench-admin-password")
+        token = str(AccessToken.for_user(admin))
+
+        servers = []
+        try:
+            wsgi_url = options["wsgi_url"] or self.spawn("wsgi", options, servers)
+            asgi_url = options["asgi_url"] or self.spawn("asgi", options, servers)
+            results = {
+                "meta": {
+                    "timestamp": timezone.now().isoformat(),
+                    "vendor": connection.vendor,
+                    "workers": options["workers"],
+                    "threads": options["threads"],
+                    "concurrency": options["concurrency"],
+                    "requests_per_endpoint": options["requests"],
+                    "wsgi_url": wsgi_url,
+                    "asgi_url": asgi_url,
+                },
+                "endpoints": {},
+            }
+            for name, method, sync_path, async_path, body in self.endpoints(options["donate"]):
+                row = {}
+                for mode, base, path in (("wsgi", wsgi_url, sync_path), ("asgi", asgi_url, async_path)):
+                    row[mode] = asyncio.run(self.drive(
+                        method, base.rstrip("/") + path, body, token, options["concurrency"], options["requests"],
+                    ))
+                results["endpoints"][name] = row
+                self.stdout.write(
+                    f"{name:18} wsgi {row['wsgi']['throughput_rps']:>8} req/s p99 {row['wsgi']['p99_ms']:>9} ms "
+                    f"errors {row['wsgi']['errors']:<5} | asgi {row['asgi']['throughput_rps']:>8} req/s "
+                    f"p99 {row['asgi']['p99_ms']:>9} ms errors {row['asgi']['errors']}"
+                )
+        finally:
+            for process in servers:
+                process.terminate()
+                process.wait(timeout=30)
+
+        with open(options["output"], "w") as handle:
+            json.dump(results, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def endpoints(self, donate):
+        """
+        (name, method, sync path, async path, body) pairs.
+        """
+        out = []
+        for prefix, model in (("projects", Project), ("donations", Donation), ("volunteers", Volunteer)):
+            out.append((f"{prefix}-list", "get", f"/api/{prefix}/", f"/api/async/{prefix}/", None))
+            pk = model.objects.order_by("-pk").values_list("pk", flat=True).first()
+            if pk is not None:
+                out.append((f"{prefix}-detail", "get", f"/api/{prefix}/{pk}/", f"/api/async/{prefix}/{pk}/", None))
+        project = Project.objects.values_list("pk", flat=True).first()
+        if donate and project is not None:
+            body = {"amount": "10.00", "phone": "254700000000", "projectId": project}
+            out.append(("donate", "post", "/api/donate/mpesa/", "/api/async/donate/mpesa/", body))
+        return out
+
+    def spawn(self, mode, options, servers):
+        if mode == "wsgi":
+            program = "gunicorn"
+            args = [
+                "community_aid.wsgi:application", "--workers", str(options["workers"]),
+                "--threads", str(options["threads"]), "--log-level", "warning",
+            ]
+        else:
+            program = "uvicorn"
+            args = ["community_aid.asgi:application", "--workers", str(options["workers"]), "--log-level", "warning"]
+        if shutil.which(program) is None:
+            raise CommandError(f"{program} is not installed; install it or pass --{mode}-url.")
+
+        port = free_port()
+        bind = ["--bind", f"127.0.0.1:{port}"] if mode == "wsgi" else ["--host", "127.0.0.1", "--port", str(port)]
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "community_aid.settings"),
+            "AID_CACHE_BACKEND": "django.core.cache.backends.dummy.DummyCache",
+            "AID_THROTTLE_DISABLED": "1",
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(settings.BASE_DIR), os.environ.get("PYTHONPATH")])),
+        }
+        servers.append(subprocess.Popen(
+            [program, *args, *bind], cwd=settings.BASE_DIR, env=env, stdout=sys.stderr, stderr=sys.stderr,
+        ))
+        url = f"http://127.0.0.1:{port}"
+        self.wait_until_up(url, servers[-1])
+        self.stdout.write(f"{program} listening on {url}")
+        return url
+
+    def wait_until_up(self, url, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"Server for {url} exited with code {process.returncode}.")
+            try:
+                httpx.get(url + "/api/", timeout=1)
+                return
+            except httpx.TransportError:
+                time.sleep(0.2)
+        raise CommandError(f"Server for {url} did not come up within {timeout}s.")
+
+    async def drive(self, method, url, body, token, concurrency, count):
+        """
+        Keep `concurrency` requests in flight until `count` have completed.
+        """
+        headers = {"Authorization": f"Bearer {token}"}
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        latencies, statuses = [], []
+        remaining = iter(range(count))
+
+        async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+            async def worker():
+                for _ in remaining:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(method, url, json=body, headers=headers)
+                        statuses.append(response.status_code)
+                    except httpx.HTTPError:
+                        statuses.append(599)
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            wall = time.perf_counter() - started
+
+        return {
+            "method": method.upper(),
+            "url": url,
+            "requests": count,
+            "errors": sum(1 for status in statuses if status >= 400),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "throughput_rps": round(count / wall, 1),
+        }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
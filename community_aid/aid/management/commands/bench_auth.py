@@ -0,0 +1,76 @@
+import base64
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from aid.auth_backends import verified_credentials
+from aid.authentication import FastJWTAuthentication
+from aid.benchmarks import summarize
+from aid.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark the per-request cost of authentication: simplejwt's class vs "
+        "FastJWTAuthentication, and Basic auth with and without the verified-credential cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000)
+        parser.add_argument(
+            "--hashing-iterations", type=int, default=20,
+            help="Iterations for uncached Basic auth, which runs the password hasher each time.",
+        )
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        results = {}
+        # The throwaway user is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user("bench-auth-user", "", "bench-password")
+            token = str(AccessToken.for_user(user))
+            factory = APIRequestFactory()
+            request = Request(factory.get("/api/projects/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+            basic = base64.b64encode(b"bench-auth-user:bench-password").decode()
+            basic_request = Request(factory.get("/api/projects/", HTTP_AUTHORIZATION=f"Basic {basic}"))
+
+            cases = (
+                ("simplejwt", JWTAuthentication(), request, options["iterations"], None),
+                ("fast", FastJWTAuthentication(), request, options["iterations"], None),
+                ("basic", BasicAuthentication(), basic_request, options["hashing_iterations"], verified_credentials.clear),
+                ("basic-cached", BasicAuthentication(), basic_request, options["iterations"], None),
+            )
+            for name, authenticator, request, iterations, before in cases:
+                authenticator.authenticate(request)  # warm caches
+                samples = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(iterations):
+                        if before:
+                            before()
+                        samples.append(self.time_once(authenticator, request))
+                summary = summarize(samples)
+                summary["us_per_request"] = round(sum(samples) / len(samples) * 1000, 2)
+                summary["queries_per_request"] = round(len(queries) / iterations, 3)
+                results[name] = summary
+                self.stdout.write(
+                    f"{name:12} {summary['us_per_request']:>9} us/request  "
+                    f"{summary['queries_per_request']} queries/request"
+                )
+            transaction.set_rollback(True)
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as handle:
+                json.dump(results, handle, indent=2)
+
+    def time_once(self, authenticator, request):
+        start = perf_counter()
+        authenticator.authenticate(request)
+        return (perf_counter() - start) * 1000
@@ -0,0 +1,106 @@
+import json
+from collections import Counter
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from aid.benchmarks import summarize
+from aid.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-request database connection cost for each alias: reconnecting every request "
+        "(CONN_MAX_AGE=0) vs a persistent connection with health checks, plus where the "
+        "queries of GET requests to the API go when read replicas are configured."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--database", action="append", help="Alias to measure (default: all).")
+        parser.add_argument("--requests", type=int, default=50, help="GET requests for the routing check.")
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        aliases = options["database"] or list(settings.DATABASES)
+        unknown = sorted(set(aliases) - set(settings.DATABASES))
+        if unknown:
+            raise CommandError(f"Unknown database aliases: {', '.join(unknown)}")
+
+        results = {}
+        for alias in aliases:
+            conn = connections[alias]
+            configured = conn.settings_dict["CONN_MAX_AGE"]
+            row = {}
+            # CONN_MAX_AGE only takes effect on the next connect()
+            for label, max_age, health_checks in (
+                ("reconnect", 0, False),
+                ("persistent", configured or 300, conn.settings_dict["CONN_HEALTH_CHECKS"]),
+            ):
+                conn.close()
+                conn.settings_dict.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks)
+                self.fake_request(conn)  # connect once outside the timings
+                samples = [self.fake_request(conn) for _ in range(options["iterations"])]
+                row[label] = summarize(samples)
+            conn.close()
+            conn.settings_dict.update(CONN_MAX_AGE=configured)
+            row["health_check"] = summarize(self.health_checks(conn, options["iterations"]))
+            row["speedup"] = round(row["reconnect"]["median_ms"] / max(row["persistent"]["median_ms"], 1e-6), 1)
+            results[alias] = row
+            self.stdout.write(
+                f"{alias:12} reconnect {row['reconnect']['median_ms']:>8} ms  "
+                f"persistent {row['persistent']['median_ms']:>8} ms  "
+                f"health check {row['health_check']['median_ms']:>8} ms  x{row['speedup']}"
+            )
+
+        results["routing"] = self.routing(options["requests"])
+        self.stdout.write(f"queries of {options['requests']} GET /api/users/ by alias: {results['routing']}")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as handle:
+                json.dump(results, handle, indent=2)
+
+    def fake_request(self, conn):
+        """
+        What a request costs the connection: Django's request_started and
+        request_finished handlers around one query.
+        """
+        start = perf_counter()
+        close_old_connections()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        close_old_connections()
+        return (perf_counter() - start) * 1000
+
+    def health_checks(self, conn, iterations):
+        conn.ensure_connection()
+        samples = []
+        for _ in range(iterations):
+            start = perf_counter()
+            conn.is_usable()
+            samples.append((perf_counter() - start) * 1000)
+        return samples
+
+    def routing(self, requests):
+        admin = User.objects.filter(is_staff=True).first()
+        if admin is None:
+            return {}
+        client = APIClient(HTTP_HOST="localhost")
+        client.force_authenticate(admin)
+        counts = Counter()
+        for _ in range(requests):
+            captures = {alias: CaptureQueriesContext(connections[alias]) for alias in settings.DATABASES}
+            for capture in captures.values():
+                capture.__enter__()
+            try:
+                client.get("/api/users/?fields=id")
+            finally:
+                for capture in captures.values():
+                    capture.__exit__(None, None, None)
+            for alias, capture in captures.items():
+                counts[alias] += len(capture)
+        return dict(counts)
@@ -0,0 +1,111 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from aid.benchmarks import seed, summarize, time_call
+from aid.models import User, Project, Donation, Beneficiary, Volunteer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query plans and latency of the hot filter/ordering paths with and without "
+        "the aid indexes. Use a scratch database: --seed inserts millions of rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="Seed synthetic data before measuring.")
+        parser.add_argument("--donations", type=int, default=2_000_000)
+        parser.add_argument("--users", type=int, default=50_000)
+        parser.add_argument("--projects", type=int, default=2_000)
+        parser.add_argument("--volunteers", type=int, default=200_000)
+        parser.add_argument("--beneficiaries", type=int, default=500_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            seed(
+                users=options["users"], projects=options["projects"], donations=options["donations"],
+                volunteers=options["volunteers"], beneficiaries=options["beneficiaries"],
+                log=self.stdout.write,
+            )
+        self.analyze()
+
+        queries = self.hot_queries()
+        if not queries:
+            self.stderr.write("No data to benchmark, run with --seed first.")
+            return
+
+        results = {"vendor": connection.vendor, "with_indexes": self.measure(queries, options["repeat"])}
+        # Drop the indexes inside a transaction and roll back afterwards (DDL is
+        # transactional on PostgreSQL and SQLite), so the schema is left untouched.
+        with transaction.atomic():
+            self.drop_indexes()
+            self.analyze()
+            results["without_indexes"] = self.measure(queries, options["repeat"])
+            transaction.set_rollback(True)
+        self.analyze()
+
+        self.report(results)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as handle:
+                json.dump(results, handle, indent=2, default=str)
+
+    def hot_queries(self):
+        # Busiest project and a known email stand in for real request parameters
+        busiest = (
+            Donation.objects.values("project_id").annotate(n=Count("id")).order_by("-n").first()
+        )
+        user = User.objects.exclude(email="").order_by("-id").first()
+        if busiest is None or user is None:
+            return {}
+        project_id = busiest["project_id"]
+        some_date = Donation.objects.filter(project_id=project_id).order_by("date").values_list("date", flat=True)[:1].get()
+        return {
+            "project donations by date": Donation.objects.filter(project_id=project_id).order_by("-date")[:50],
+            "donation keyset page": Donation.objects.filter(date__lt=some_date).order_by("-date", "-id")[:50],
+            "approved beneficiaries of project": Beneficiary.objects.filter(project_id=project_id, approved=True)[:50],
+            "approved volunteers of project": Volunteer.objects.filter(status="approved", project_id=project_id)[:50],
+            "projects by status and start": Project.objects.filter(status="active").order_by("-start_date")[:50],
+            "login by email": User.objects.exclude(email="").filter(email=user.email),
+        }
+
+    def measure(self, queries, repeat):
+        out = {}
+        for name, queryset in queries.items():
+            out[name] = {
+                "plan": queryset.explain(),
+                "latency": summarize(time_call(lambda: list(queryset.all()), repeat)),
+            }
+        return out
+
+    def drop_indexes(self):
+        # Every aid index and the partial unique email constraint are plain
+        # (unique) indexes on PostgreSQL and SQLite, so DROP INDEX covers them all.
+        names = []
+        for model in (User, Project, Donation, Beneficiary, Volunteer):
+            names += [index.name for index in model._meta.indexes]
+            names += [constraint.name for constraint in model._meta.constraints]
+        with connection.cursor() as cursor:
+            for name in names:
+                # The search GIN indexes only exist on PostgreSQL
+                cursor.execute(f"DROP INDEX IF EXISTS {connection.ops.quote_name(name)}")
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def report(self, results):
+        for name, after in results["with_indexes"].items():
+            before = results["without_indexes"][name]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(
+                f"  median {before['latency']['median_ms']} ms -> {after['latency']['median_ms']} ms, "
+                f"p95 {before['latency']['p95_ms']} ms -> {after['latency']['p95_ms']} ms"
+            )
+            self.stdout.write("  plan without indexes:")
+            self.stdout.write("    " + before["plan"].replace("\n", "\n    "))
+            self.stdout.write("  plan with indexes:")
+            self.stdout.write("    " + after["plan"].replace("\n", "\n    "))
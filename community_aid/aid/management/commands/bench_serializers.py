@@ -0,0 +1,74 @@
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from aid.benchmarks import seed
+from aid.fastlist import FastListPlan
+from aid.models import User
+from aid.renderers import FastJSONRenderer
+from aid.views import DonationViewSet, UserViewSet, VolunteerViewSet
+
+VIEWSETS = {"donations": DonationViewSet, "users": UserViewSet, "volunteers": VolunteerViewSet}
+
+
+class Command(BaseCommand):
+    help = (
+        "Rows per second for list serialization: DRF serializers + JSONRenderer vs the "
+        "values()-based fast path + orjson (aid/fastlist.py), on the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="Seed synthetic data first.")
+        parser.add_argument("--rows", type=int, default=5000, help="Rows serialized per run.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            seed(log=self.stdout.write)
+        admin = User.objects.filter(is_staff=True).first() or User.objects.first()
+        if admin is None:
+            raise CommandError("No data, run with --seed.")
+        factory = APIRequestFactory()
+
+        results = {}
+        for name, viewset_class in VIEWSETS.items():
+            request = Request(factory.get(f"/api/{name}/"))
+            request.user = admin
+            view = viewset_class(request=request, action="list", args=(), kwargs={}, format_kwarg=None)
+            queryset = view.filter_queryset(view.get_queryset()).order_by("-pk")[:options["rows"]]
+            plan, hidden = view.get_fast_list_plan()
+
+            def drf():
+                data = view.get_serializer(list(queryset), many=True).data
+                return JSONRenderer().render(data)
+
+            def fast():
+                data = plan.render(list(plan.rows(queryset)), hidden)
+                return FastJSONRenderer().render(data)
+
+            if json.loads(drf()) != json.loads(fast()):
+                raise CommandError(f"{name}: the fast path's output differs from the serializer's")
+            row = {}
+            for label, func in (("serializer", drf), ("fast", fast)):
+                best = min(self.time_once(func) for _ in range(options["repeat"]))
+                row[label] = {"ms": round(best * 1000, 2), "rows_per_second": round(queryset.count() / best)}
+            row["speedup"] = round(row["serializer"]["ms"] / row["fast"]["ms"], 2)
+            results[name] = row
+            self.stdout.write(
+                f"{name:11} serializer {row['serializer']['rows_per_second']:>9} rows/s  "
+                f"fast {row['fast']['rows_per_second']:>9} rows/s  x{row['speedup']}"
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as handle:
+                json.dump(results, handle, indent=2)
+
+    def time_once(self, func):
+        start = perf_counter()
+        func()
+        return perf_counter() - start
@@ -0,0 +1,39 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from aid.ingest import DonationImporter, IngestError, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Stream donations from a CSV or JSONL file (or - for stdin) into the database in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - to read stdin.")
+        parser.add_argument("--format", dest="file_format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--report", help="Write the JSON error report to this file.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            fmt = detect_format(path, options["file_format"])
+        except IngestError as e:
+            raise CommandError(str(e))
+
+        importer = DonationImporter(chunk_size=options["chunk_size"])
+        if path == "-":
+            report = importer.run(iter_rows(sys.stdin.buffer, fmt))
+        else:
+            with open(path, "rb") as handle:
+                report = importer.run(iter_rows(handle, fmt))
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report["errors_truncated"]:
+            self.stderr.write(f"... {report['failed'] - len(report['errors'])} more errors not shown")
+        if options["report"]:
+            with open(options["report"], "w") as handle:
+                json.dump(report, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Imported {report['created']} donations, {report['failed']} rows failed."))
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from aid import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the donations table partitioned by month on PostgreSQL: create the partitions of "
+        "this month and the next AID_DONATION_PARTITIONS_AHEAD, moving in rows the default "
+        "partition caught. --convert partitions the table the first time (locks it while it copies)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Partition the table if it is not yet.")
+        parser.add_argument("--months", type=int, default=None, help="Months ahead to prepare.")
+        parser.add_argument(
+            "--drop-empty", type=int, metavar="MONTHS", default=None,
+            help="Also drop empty partitions wholly older than this many months.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Print the conversion SQL without running it.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Donation partitioning needs PostgreSQL.")
+        ahead = options["months"]
+        if ahead is None:
+            ahead = getattr(settings, "AID_DONATION_PARTITIONS_AHEAD", 3)
+
+        with connection.cursor() as cursor:
+            partitioned = partitions.is_partitioned(cursor)
+        if not partitioned:
+            if not options["convert"]:
+                raise CommandError(f"{partitions.TABLE} is not partitioned; run with --convert first.")
+            if options["dry_run"]:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    self.stdout.write(";\n".join(partitions.conversion_sql(cursor, ahead)) + ";")
+                return
+            partitions.convert(ahead)
+            self.stdout.write(self.style.SUCCESS(f"Partitioned {partitions.TABLE} by month."))
+        elif options["dry_run"]:
+            self.stdout.write(f"{partitions.TABLE} is already partitioned.")
+            return
+
+        for name in partitions.ensure_partitions(ahead):
+            self.stdout.write(f"Created {name}")
+        if options["drop_empty"] is not None:
+            before = partitions.add_months(partitions.month_start(timezone.now()), -options["drop_empty"])
+            for name in partitions.drop_empty_partitions(before):
+                self.stdout.write(f"Dropped empty {name}")
+
+        stray = partitions.default_partition_rows()
+        if stray:
+            self.stdout.write(self.style.WARNING(
+                f"{stray} donation(s) sit in {partitions.DEFAULT_PARTITION}, outside every monthly partition."
+            ))
+        self.stdout.write(self.style.SUCCESS("Donation partitions are up to date."))
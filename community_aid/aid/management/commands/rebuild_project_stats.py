@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from aid.models import Project, ProjectStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-project donation aggregates from the donations table, or check them for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drift, do not write anything.")
+        parser.add_argument("--project", type=int, action="append", help="Limit to this project id (repeatable).")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by("id")
+        if options["project"]:
+            projects = projects.filter(id__in=options["project"])
+
+        drifted = 0
+        for project_id in projects.values_list("id", flat=True).iterator():
+            with transaction.atomic():
+                expected = ProjectStats.compute(project_id)
+                if options["check"]:
+                    current = ProjectStats.objects.filter(project_id=project_id).first()
+                else:
+                    current = ProjectStats.locked(project_id)
+                if current is None:
+                    current = ProjectStats(project_id=project_id)
+                if current.matches(expected):
+                    continue
+                drifted += 1
+                self.stdout.write(
+                    f"Project {project_id}: stored total={current.total_amount} count={current.donation_count} "
+                    f"donors={current.donor_count} last={current.last_donation_at}; "
+                    f"actual total={expected.total_amount} count={expected.donation_count} "
+                    f"donors={expected.donor_count} last={expected.last_donation_at}"
+                )
+                if not options["check"]:
+                    expected.save()
+
+        if options["check"]:
+            if drifted:
+                raise CommandError(f"{drifted} project(s) have drifted aggregates.")
+            self.stdout.write(self.style.SUCCESS("All project aggregates are consistent."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt aggregates, {drifted} project(s) corrected."))
@@ -0,0 +1,78 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from aid.tasks import Worker
+
+
+def work(queues, poll_interval, burst):
+    worker = Worker(queues=queues, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl-C
+    worker.run(burst=burst)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers (aid/tasks.py). Starts --processes worker processes, "
+        "restarts any that die, and on SIGTERM or Ctrl-C lets each finish its current job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2, help="Worker processes to run.")
+        parser.add_argument("--queues", help="Comma-separated queues to serve (default: all).")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle.")
+        parser.add_argument("--burst", action="store_true", help="Exit once no job is due.")
+
+    def handle(self, *args, **options):
+        if options["processes"] < 1:
+            raise CommandError("--processes must be at least 1.")
+        queues = [q.strip() for q in options["queues"].split(",") if q.strip()] if options["queues"] else None
+        worker_args = (queues, options["poll_interval"], options["burst"])
+
+        if options["processes"] == 1:
+            worker = Worker(queues=queues, poll_interval=options["poll_interval"])
+            signal.signal(signal.SIGTERM, worker.stop)
+            try:
+                worker.run(burst=options["burst"])
+            except KeyboardInterrupt:
+                pass
+            return
+
+        # Children must not inherit the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        children = [self.start(context, worker_args) for _ in range(options["processes"])]
+        self.stdout.write(f"Started {len(children)} workers serving {', '.join(queues) if queues else 'all queues'}")
+
+        stopping = False
+
+        def shutdown(*args):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        while not stopping:
+            for i, child in enumerate(children):
+                if child.is_alive() or options["burst"]:
+                    continue
+                self.stderr.write(f"Worker {child.pid} exited with code {child.exitcode}, restarting")
+                children[i] = self.start(context, worker_args)
+            if options["burst"] and not any(child.is_alive() for child in children):
+                break
+            time.sleep(1)
+
+        for child in children:
+            if child.is_alive():
+                child.terminate()  # SIGTERM: finish the current job, then stop
+        for child in children:
+            child.join()
+
+    def start(self, context, worker_args):
+        process = context.Process(target=work, args=worker_args, daemon=False)
+        process.start()
+        return process
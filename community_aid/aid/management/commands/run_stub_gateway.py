@@ -0,0 +1,102 @@
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from aid.payments import sign
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the Flutterwave payments API. It accepts "
+        "POST /v3/payments and later calls the signed webhook, so the M-Pesa "
+        "pipeline can be load-tested offline. Set FLUTTERWAVE_BASE_URL to its address."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--webhook-url", default="http://127.0.0.1:8000/api/donate/mpesa/webhook/")
+        parser.add_argument("--latency", type=float, default=0.2, help="Seconds before answering /v3/payments.")
+        parser.add_argument("--settle-after", type=float, default=1.0, help="Seconds before the webhook fires.")
+        parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of payments reported as failed.")
+
+    def handle(self, *args, **options):
+        if not settings.FLUTTERWAVE_WEBHOOK_SECRET:
+            self.stderr.write("FLUTTERWAVE_WEBHOOK_SECRET is empty; the webhook will reject every callback.")
+        handler = self.make_handler(options)
+        server = ThreadingHTTPServer((options["host"], options["port"]), handler)
+        self.stdout.write(f"Stub gateway listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def make_handler(self, options):
+        callbacks = requests.Session()  # keep-alive to the webhook as well
+        stdout = self.stdout
+
+        def deliver(payload):
+            time.sleep(options["settle_after"])
+            body = json.dumps(payload).encode()
+            try:
+                response = callbacks.post(
+                    options["webhook_url"], data=body, timeout=10,
+                    headers={"Content-Type": "application/json", "flutterwave-signature": sign(body)},
+                )
+                stdout.write(f"webhook {payload['data']['tx_ref']} -> {response.status_code}")
+            except requests.RequestException as e:
+                stdout.write(f"webhook {payload['data']['tx_ref']} failed: {e}")
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real gateway
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self.reply(400, {"status": "error", "message": "Invalid JSON"})
+                if self.path.rstrip("/") != "/v3/payments":
+                    return self.reply(404, {"status": "error", "message": "Not found"})
+
+                time.sleep(options["latency"])
+                tx_ref = request.get("tx_ref")
+                self.reply(200, {
+                    "status": "success",
+                    "message": "Hosted Link",
+                    "data": {"link": f"http://{options['host']}:{options['port']}/pay/{tx_ref}"},
+                })
+                failed = random.random() < options["fail_rate"]
+                payload = {
+                    "event": "charge.completed",
+                    "data": {
+                        "id": uuid.uuid4().int % 10**9,
+                        "tx_ref": tx_ref,
+                        "amount": request.get("amount"),
+                        "currency": request.get("currency"),
+                        "status": "failed" if failed else "successful",
+                    },
+                }
+                threading.Thread(target=deliver, args=(payload,), daemon=True).start()
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,212 @@
+"""
+Opt-in request profiling (AID_PROFILING = True).
+
+For every resolved route it records wall time, SQL query count and time,
+time spent in DRF permission checks and in serializer .data, and the
+response size. Requests slower than AID_PROFILING_SLOW_MS keep their full
+query list for /api/metrics/slow/. Totals are exposed in Prometheus text
+format on /api/metrics/ (staff only).
+
+When profiling is off the middleware raises MiddlewareNotUsed and no hook
+is installed, so it costs nothing.
+"""
+import contextvars
+import logging
+from contextlib import ExitStack
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+MAX_QUERIES_PER_SAMPLE = 500
+
+_current = contextvars.ContextVar("aid_request_profile", default=None)
+
+
+class RequestProfile:
+    __slots__ = ("sql_count", "sql_seconds", "serializer_seconds", "permission_seconds", "queries")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.permission_seconds = 0.0
+        self.queries = []
+
+
+class RouteMetrics:
+    __slots__ = ("buckets", "count", "seconds", "sql_count", "sql_seconds",
+                 "serializer_seconds", "permission_seconds", "response_bytes")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.permission_seconds = 0.0
+        self.response_bytes = 0
+
+
+class MetricsRegistry:
+    def __init__(self, slow_samples=50):
+        self._lock = threading.Lock()
+        self.routes = {}
+        self.slow = deque(maxlen=slow_samples)
+
+    def observe(self, route, method, status, seconds, profile, size):
+        with self._lock:
+            metrics = self.routes.get((route, method))
+            if metrics is None:
+                metrics = self.routes[(route, method)] = RouteMetrics()
+            elapsed_ms = seconds * 1000
+            for index, bound in enumerate(BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    metrics.buckets[index] += 1
+            metrics.count += 1
+            metrics.seconds += seconds
+            metrics.sql_count += profile.sql_count
+            metrics.sql_seconds += profile.sql_seconds
+            metrics.serializer_seconds += profile.serializer_seconds
+            metrics.permission_seconds += profile.permission_seconds
+            metrics.response_bytes += size
+
+    def record_slow(self, sample):
+        with self._lock:
+            self.slow.append(sample)
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+            self.slow.clear()
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            items = sorted(self.routes.items())
+            lines += [
+                "# HELP aid_request_duration_seconds Wall time of API requests.",
+                "# TYPE aid_request_duration_seconds histogram",
+            ]
+            for (route, method), m in items:
+                labels = f'route="{route}",method="{method}"'
+                for bound, value in zip(BUCKETS_MS, m.buckets):
+                    lines.append(f'aid_request_duration_seconds_bucket{{{labels},le="{bound / 1000}"}} {value}')
+                lines.append(f'aid_request_duration_seconds_bucket{{{labels},le="+Inf"}} {m.count}')
+                lines.append(f"aid_request_duration_seconds_sum{{{labels}}} {m.seconds:.6f}")
+                lines.append(f"aid_request_duration_seconds_count{{{labels}}} {m.count}")
+            for name, attr, help_text in (
+                ("aid_request_sql_queries_total", "sql_count", "SQL queries run by API requests."),
+                ("aid_request_sql_seconds_total", "sql_seconds", "Time spent in SQL."),
+                ("aid_request_serializer_seconds_total", "serializer_seconds", "Time spent building serializer data."),
+                ("aid_request_permission_seconds_total", "permission_seconds", "Time spent in permission checks."),
+                ("aid_response_bytes_total", "response_bytes", "Response body bytes."),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (route, method), m in items:
+                    value = getattr(m, attr)
+                    value = f"{value:.6f}" if isinstance(value, float) else value
+                    lines.append(f'{name}{{route="{route}",method="{method}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        profile.sql_count += 1
+        profile.sql_seconds += elapsed
+        if len(profile.queries) < MAX_QUERIES_PER_SAMPLE:
+            profile.queries.append({"sql": sql, "ms": round(elapsed * 1000, 3)})
+
+
+def _timed(func, attr):
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            setattr(profile, attr, getattr(profile, attr) + time.perf_counter() - start)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+
+def install_drf_hooks():
+    """
+    Wrap the DRF entry points we time. Done once, and only when profiling is on.
+    """
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        from rest_framework import serializers, views
+
+        views.APIView.check_permissions = _timed(views.APIView.check_permissions, "permission_seconds")
+        views.APIView.check_object_permissions = _timed(views.APIView.check_object_permissions, "permission_seconds")
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            cls.data = property(_timed(cls.data.fget, "serializer_seconds"))
+        _hooks_installed = True
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "AID_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, "AID_PROFILING_SLOW_MS", 500) / 1000
+        install_drf_hooks()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(_sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else "unresolved"
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, elapsed, profile, size)
+        if elapsed >= self.slow_seconds:
+            sample = {
+                "route": route,
+                "method": request.method,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                "ms": round(elapsed * 1000, 3),
+                "sql_ms": round(profile.sql_seconds * 1000, 3),
+                "serializer_ms": round(profile.serializer_seconds * 1000, 3),
+                "permission_ms": round(profile.permission_seconds * 1000, 3),
+                "queries": profile.queries,
+            }
+            registry.record_slow(sample)
+            logger.warning("Slow request %s %s took %.1f ms (%d queries)", request.method, sample["path"], sample["ms"], profile.sql_count)
+        return response
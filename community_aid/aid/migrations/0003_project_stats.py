@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_project_stats(apps, schema_editor):
+    Donation = apps.get_model('aid', 'Donation')
+    ProjectStats = apps.get_model('aid', 'ProjectStats')
+    rows = (
+        Donation.objects.values('project_id')
+        .annotate(
+            total_amount=Sum('amount'),
+            donation_count=Count('id'),
+            donor_count=Count('donor', distinct=True),
+            last_donation_at=Max('date'),
+        )
+        .order_by()
+    )
+    ProjectStats.objects.bulk_create(ProjectStats(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0002_volunteer_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='aid.project')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('donation_count', models.PositiveIntegerField(default=0)),
+                ('donor_count', models.PositiveIntegerField(default=0)),
+                ('last_donation_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_project_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    Emails were never unique before aid_user_email_uniq. Rather than pick
+    which account loses a shared address, stop here and name them all, so
+    they can be merged or given new addresses before migrating again.
+    """
+    User = apps.get_model('aid', 'User')
+    shared = (
+        User.objects.exclude(email='').values('email')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('email', flat=True)
+    )
+    clashes = []
+    for email in shared:
+        pks = User.objects.filter(email=email).order_by('pk').values_list('pk', flat=True)
+        clashes.append(f"{email} (users {', '.join(map(str, pks))})")
+    if clashes:
+        raise RuntimeError(
+            "Cannot add aid_user_email_uniq: these emails belong to more than one user: " + "; ".join(clashes)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0003_project_stats'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='beneficiary',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['project'], name='aid_benef_approved_proj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['project', 'date'], name='aid_donation_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['date', 'id'], name='aid_donation_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['status', 'start_date'], name='aid_project_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteer',
+            index=models.Index(fields=['status', 'project'], name='aid_volunteer_status_proj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='volunteer',
+            index=models.Index(fields=['date_joined', 'id'], name='aid_volunteer_joined_id_idx'),
+        ),
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(condition=models.Q(('email', ''), _negated=True), fields=('email',), name='aid_user_email_uniq'),
+        ),
+    ]
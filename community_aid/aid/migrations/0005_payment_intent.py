@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0004_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(default='KES', max_length=3)),
+                ('phone', models.CharField(max_length=20)),
+                ('tx_ref', models.CharField(max_length=64, unique=True)),
+                ('idempotency_key', models.CharField(blank=True, max_length=64, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('initiated', 'Initiated'), ('successful', 'Successful'), ('failed', 'Failed')], default='pending', max_length=12)),
+                ('gateway_reference', models.CharField(blank=True, max_length=64)),
+                ('payment_link', models.URLField(blank=True, max_length=500)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('donation', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_intent', to='aid.donation')),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_intents', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='aid.project')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('donor', 'idempotency_key'), name='aid_payment_idempotency_uniq')],
+            },
+        ),
+    ]
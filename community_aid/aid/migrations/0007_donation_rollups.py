@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0006_claims_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDonorDonations',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('donation_count', models.IntegerField(default=0)),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_donations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='aid_daily_donor_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('donor', 'day'), name='aid_daily_donor_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProjectDonations',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('donation_count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_donations', to='aid.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='aid_daily_project_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('project', 'day'), name='aid_daily_project_uniq')],
+            },
+        ),
+    ]
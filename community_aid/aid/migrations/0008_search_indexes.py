@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:01
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """
+    AddIndex that only touches PostgreSQL. GIN indexes and tsvector
+    expressions don't exist elsewhere, and the SQLite test database searches
+    without them (see aid/search.py).
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0007_donation_rollups'),
+    ]
+
+    operations = [
+        TrigramExtension(),  # no-op on other databases
+        AddPostgresIndex(
+            model_name='beneficiary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='aid_benef_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        AddPostgresIndex(
+            model_name='project',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('status', config='english', weight='C'), django.contrib.postgres.search.SearchConfig('english')), name='aid_project_search_idx'),
+        ),
+    ]
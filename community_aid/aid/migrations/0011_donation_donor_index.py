@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donor', 'date', 'id'], name='aid_donation_donor_date_idx'),
+        ),
+    ]
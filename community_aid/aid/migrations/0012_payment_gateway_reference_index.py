@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0011_donation_donor_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentintent',
+            index=models.Index(condition=models.Q(('gateway_reference', ''), _negated=True), fields=['gateway_reference'], name='aid_payment_gateway_ref_idx'),
+        ),
+    ]
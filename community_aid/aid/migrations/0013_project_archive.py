@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0012_payment_gateway_reference_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectArchive',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='aid.project')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('file', models.CharField(max_length=255)),
+                ('donation_count', models.PositiveIntegerField(default=0)),
+                ('donation_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('volunteer_count', models.PositiveIntegerField(default=0)),
+                ('beneficiary_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedDonation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateTimeField()),
+                ('donor', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_donations', to='aid.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'donor'], name='aid_archived_donation_proj_idx')],
+            },
+        ),
+    ]
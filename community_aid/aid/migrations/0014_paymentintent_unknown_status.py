@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0013_project_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentintent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('initiated', 'Initiated'), ('unknown', 'Unknown'), ('successful', 'Successful'), ('failed', 'Failed')], default='pending', max_length=12),
+        ),
+    ]
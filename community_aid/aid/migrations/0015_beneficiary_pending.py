@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery
+
+
+def mark_pending(apps, schema_editor):
+    """
+    False used to mean both "not yet reviewed" and "rejected". Only rows
+    whose latest audit entry is a rejection stay False; the rest are pending.
+    """
+    Beneficiary = apps.get_model('aid', 'Beneficiary')
+    ApprovalAudit = apps.get_model('aid', 'ApprovalAudit')
+    latest = (
+        ApprovalAudit.objects.filter(subject_type='beneficiary', subject_id=OuterRef('pk'))
+        .order_by('-created_at', '-pk').values('to_state')[:1]
+    )
+    (
+        Beneficiary.objects.filter(approved=False).annotate(last_state=Subquery(latest))
+        .filter(Q(last_state=None) | ~Q(last_state__in=('rejected', 'unapproved'))).update(approved=None)
+    )
+
+
+def unmark_pending(apps, schema_editor):
+    apps.get_model('aid', 'Beneficiary').objects.filter(approved=None).update(approved=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aid', '0014_paymentintent_unknown_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='beneficiary',
+            name='approved',
+            field=models.BooleanField(default=None, null=True),
+        ),
+        migrations.RunPython(mark_pending, unmark_pending),
+    ]
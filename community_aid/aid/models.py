@@ -1,5 +1,11 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 
 class User(AbstractUser):
     date_of_birth = models.DateField(null=True, blank=True)
@@ -21,11 +27,49 @@ class User(AbstractUser):
         verbose_name="user permissions",
     )
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # EmailBackend logs in by email; blank emails are still allowed for many users
+            models.UniqueConstraint(fields=["email"], condition=~Q(email=""), name="aid_user_email_uniq"),
+        ]
+
     def __str__(self):
         if self.first_name and self.last_name:
             return f"{self.first_name} {self.last_name}"
         return self.username
     
+class ClaimsUser(User):
+    """
+    A User built by aid.authentication.FastJWTAuthentication without a query.
+    Only the authentication fields are loaded; touching any other field
+    loads the rest of the row in one query rather than one per field.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+
+SEARCH_CONFIG = "english"
+
+
+def project_search_vector():
+    """
+    The weighted full-text document of a project (see aid/search.py). The
+    GIN index on Project is built on this exact expression, so queries must
+    use it unchanged for PostgreSQL to pick the index.
+    """
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("status", weight="C", config=SEARCH_CONFIG)
+    )
+
+
 class Project(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
@@ -34,20 +78,250 @@ class Project(models.Model):
     status = models.CharField(max_length=50)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "start_date"], name="aid_project_status_start_idx"),
+            # PostgreSQL only, see migration 0008
+            GinIndex(project_search_vector(), name="aid_project_search_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def donation_stats(self):
+        # Projects without donations have no stats row yet, report zeros
+        try:
+            return self.stats
+        except ProjectStats.DoesNotExist:
+            return ProjectStats(project=self)
+
 class Donation(models.Model):
     donor = models.ForeignKey(User, on_delete=models.CASCADE)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "date"], name="aid_donation_project_date_idx"),
+            # Keyset pagination and the admin date filter walk (date, id)
+            models.Index(fields=["date", "id"], name="aid_donation_date_id_idx"),
+            # Non-staff list only their own donations, newest first
+            models.Index(fields=["donor", "date", "id"], name="aid_donation_donor_date_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the save and the aggregate update (see aid/signals.py) in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+def as_decimal(amount):
+    # A donation saved with amount="10.00" keeps the string on the instance
+    return amount if isinstance(amount, Decimal) else Decimal(str(amount))
+
+
+class ProjectStats(models.Model):
+    """
+    Denormalized donation totals for a project.
+    Maintained by the Donation signals in aid/signals.py so the dashboard
+    never has to sum the donations table.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    donation_count = models.PositiveIntegerField(default=0)
+    donor_count = models.PositiveIntegerField(default=0)
+    last_donation_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Stats for project {self.project_id}"
+
+    @classmethod
+    def locked(cls, project_id):
+        # Row lock so concurrent donations to one project serialize their updates
+        stats, _ = cls.objects.select_for_update().get_or_create(project_id=project_id)
+        return stats
+
+    @classmethod
+    def add_donation(cls, donation):
+        stats = cls.locked(donation.project_id)
+        # First donation by this donor to the project? (the new row already exists)
+        donor_rows = Donation.objects.filter(project_id=donation.project_id, donor_id=donation.donor_id)
+        if not donor_rows.exclude(pk=donation.pk).exists():
+            stats.donor_count += 1
+        stats.total_amount += as_decimal(donation.amount)
+        stats.donation_count += 1
+        if stats.last_donation_at is None or donation.date > stats.last_donation_at:
+            stats.last_donation_at = donation.date
+        stats.save()
+
+    @classmethod
+    def add_donations(cls, donations):
+        """
+        Fold a batch of just-inserted donations (bulk_create skips the signals)
+        into the aggregates with one grouped query and one locked row per project.
+        """
+        batches = {}
+        for donation in donations:
+            batch = batches.setdefault(donation.project_id, {"total": 0, "count": 0, "last": None, "donors": {}})
+            batch["total"] += as_decimal(donation.amount)
+            batch["count"] += 1
+            if batch["last"] is None or donation.date > batch["last"]:
+                batch["last"] = donation.date
+            batch["donors"][donation.donor_id] = batch["donors"].get(donation.donor_id, 0) + 1
+        if not batches:
+            return
+
+        # A donor is new to a project if all of their donations there are in this batch
+        stored = (
+            Donation.objects.filter(project_id__in=batches, donor_id__in={d.donor_id for d in donations})
+            .values("project_id", "donor_id").annotate(n=Count("id")).order_by()
+            .values_list("project_id", "donor_id", "n")
+        )
+        stored = {(project_id, donor_id): n for project_id, donor_id, n in stored}
+
+        for project_id in sorted(batches):  # fixed lock order, no deadlocks between importers
+            batch = batches[project_id]
+            stats = cls.locked(project_id)
+            stats.donor_count += sum(
+                1 for donor_id, n in batch["donors"].items() if stored.get((project_id, donor_id)) == n
+            )
+            stats.total_amount += batch["total"]
+            stats.donation_count += batch["count"]
+            if stats.last_donation_at is None or batch["last"] > stats.last_donation_at:
+                stats.last_donation_at = batch["last"]
+            stats.save()
+
+    @classmethod
+    def remove_donation(cls, project_id, donor_id, amount, date, exclude_pk=None):
+        if not cls.objects.filter(project_id=project_id).exists():
+            return  # Project is being deleted, or stats were never built
+        stats = cls.locked(project_id)
+        remaining = Donation.objects.filter(project_id=project_id)
+        if exclude_pk is not None:
+            remaining = remaining.exclude(pk=exclude_pk)
+        if not remaining.filter(donor_id=donor_id).exists():
+            stats.donor_count = max(stats.donor_count - 1, 0)
+        stats.total_amount -= as_decimal(amount)
+        stats.donation_count = max(stats.donation_count - 1, 0)
+        if stats.last_donation_at is not None and date >= stats.last_donation_at:
+            stats.last_donation_at = remaining.aggregate(last=Max("date"))["last"]
+        stats.save()
+
+    @classmethod
+    def compute(cls, project_id):
+        """
+        Recompute the aggregates for one project straight from the donations
+        table, and the archived donations if the project was archived.
+        """
+        donations = Donation.objects.filter(project_id=project_id)
+        totals = donations.aggregate(
+            total_amount=Sum("amount"),
+            donation_count=Count("id"),
+            donor_count=Count("donor", distinct=True),
+            last_donation_at=Max("date"),
+        )
+        if ProjectArchive.objects.filter(project_id=project_id).exists():
+            archived = ArchivedDonation.objects.filter(project_id=project_id)
+            more = archived.aggregate(total_amount=Sum("amount"), donation_count=Count("id"), last_donation_at=Max("date"))
+            totals["total_amount"] = (totals["total_amount"] or 0) + (more["total_amount"] or 0)
+            totals["donation_count"] += more["donation_count"]
+            totals["last_donation_at"] = max(filter(None, (totals["last_donation_at"], more["last_donation_at"])), default=None)
+            # UNION drops the donors who gave both before and after archiving
+            totals["donor_count"] = donations.values("donor_id").union(archived.values("donor_id")).count()
+        totals["total_amount"] = totals["total_amount"] or 0
+        return cls(project_id=project_id, **totals)
+
+    def matches(self, other):
+        return (
+            self.total_amount == other.total_amount
+            and self.donation_count == other.donation_count
+            and self.donor_count == other.donor_count
+            and self.last_donation_at == other.last_donation_at
+        )
+
+class DonationRollup(models.Model):
+    """
+    Donation totals per day for one dimension (project or donor).
+    Kept current by the Donation signals; backfill_rollups rebuilds it.
+    """
+    day = models.DateField()
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    donation_count = models.IntegerField(default=0)
+
+    key_field = None  # Donation attribute this rollup groups by
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def apply(cls, changes):
+        """
+        Fold donation changes into the daily rows. Each change is a dict with
+        the donation's project_id, donor_id, amount and date, plus sign (+1 / -1).
+        """
+        deltas = {}
+        for change in changes:
+            key = (change[cls.key_field], timezone.localdate(change["date"]))
+            total, count = deltas.get(key, (0, 0))
+            deltas[key] = (total + change["sign"] * as_decimal(change["amount"]), count + change["sign"])
+
+        for (key, day), (total, count) in sorted(deltas.items()):
+            if not total and not count:
+                continue
+            rows = cls.objects.filter(**{cls.key_field: key, "day": day})
+            if count < 0:
+                # Removals never create rows: during a cascade delete the
+                # project or donor may already be gone
+                rows.update(total_amount=F("total_amount") + total, donation_count=F("donation_count") + count)
+                rows.filter(donation_count__lte=0).delete()
+                continue
+            cls.objects.select_for_update().get_or_create(**{cls.key_field: key, "day": day})
+            rows.update(total_amount=F("total_amount") + total, donation_count=F("donation_count") + count)
+
+
+class DailyProjectDonations(DonationRollup):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="daily_donations")
+
+    key_field = "project_id"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["project", "day"], name="aid_daily_project_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="aid_daily_project_day_idx"),
+        ]
+
+
+class DailyDonorDonations(DonationRollup):
+    donor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_donations")
+
+    key_field = "donor_id"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["donor", "day"], name="aid_daily_donor_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="aid_daily_donor_day_idx"),
+        ]
+
+
 class Beneficiary(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
     contact_info = models.CharField(max_length=200)
-    approved = models.BooleanField(default=False)  # Admin approval required
+    approved = models.BooleanField(null=True, default=None)  # None until an admin approves or rejects
+
+    class Meta:
+        indexes = [
+            # Non-staff only ever list approved beneficiaries
+            models.Index(fields=["project"], condition=Q(approved=True), name="aid_benef_approved_proj_idx"),
+            # Trigram index for fuzzy name search; PostgreSQL only, see migration 0008
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="aid_benef_name_trgm_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -71,5 +345,172 @@ class Volunteer(models.Model):
         default="pending"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "project"], name="aid_volunteer_status_proj_idx"),
+            models.Index(fields=["date_joined", "id"], name="aid_volunteer_joined_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.project.title}"
+
+
+class PaymentIntent(models.Model):
+    """
+    A donation the donor has asked to pay through the gateway.
+    Recorded before any gateway traffic; the Donation row is only written
+    when the gateway's signed webhook confirms payment.
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pending"),            # recorded, gateway call queued
+        ("initiated", "Initiated"),        # gateway accepted, waiting for the donor to pay
+        ("unknown", "Unknown"),            # gateway call errored or timed out; retried, and the webhook may still settle it
+        ("successful", "Successful"),      # webhook confirmed, donation settled
+        ("failed", "Failed"),
+    )
+    donor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="payment_intents")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default="KES")
+    phone = models.CharField(max_length=20)
+    tx_ref = models.CharField(max_length=64, unique=True)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default="pending")
+    gateway_reference = models.CharField(max_length=64, blank=True)
+    payment_link = models.URLField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    donation = models.OneToOneField(Donation, on_delete=models.SET_NULL, null=True, blank=True, related_name="payment_intent")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # A retried POST with the same Idempotency-Key must not charge twice
+            models.UniqueConstraint(fields=["donor", "idempotency_key"], name="aid_payment_idempotency_uniq"),
+        ]
+        indexes = [
+            # Admin lookups by the gateway's id; most intents never get one
+            models.Index(fields=["gateway_reference"], condition=~Q(gateway_reference=""), name="aid_payment_gateway_ref_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tx_ref} ({self.status})"
+
+
+class ApprovalAudit(models.Model):
+    """
+    One approve/reject transition of a volunteer or beneficiary (see aid/approvals.py).
+    """
+    SUBJECT_CHOICES = (
+        ("volunteer", "Volunteer"),
+        ("beneficiary", "Beneficiary"),
+    )
+    subject_type = models.CharField(max_length=12, choices=SUBJECT_CHOICES)
+    subject_id = models.PositiveBigIntegerField()
+    from_state = models.CharField(max_length=10)
+    to_state = models.CharField(max_length=10)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["subject_type", "subject_id"], name="aid_audit_subject_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject_type} {self.subject_id}: {self.from_state} -> {self.to_state}"
+
+
+class Notification(models.Model):
+    """
+    An outgoing email, written with the change it reports and delivered
+    afterwards by a background task (see aid/notifications.py).
+    """
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Delivery only ever looks for unsent rows
+            models.Index(fields=["created_at"], condition=Q(sent_at__isnull=True), name="aid_notification_unsent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient_id}"
+
+
+class Job(models.Model):
+    """
+    A queued call of a module-level function, run by `manage.py run_jobs` (see aid/tasks.py).
+    """
+    STATUS_CHOICES = (
+        ("queued", "Queued"),      # waiting for run_at
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),      # out of attempts
+    )
+    name = models.CharField(max_length=200)  # dotted path of the function
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    queue = models.CharField(max_length=50, default="default")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan due, queued jobs
+            models.Index(fields=["run_at", "id"], condition=Q(status="queued"), name="aid_job_due_idx"),
+            models.Index(fields=["status", "queue"], name="aid_job_status_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class ArchivedDonation(models.Model):
+    """
+    A donation of an archived project (see aid/archive.py), with the same id
+    and columns. Rows are only appended and summed, so there are no foreign
+    key constraints and a single index.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name="archived_donations"
+    )
+    # The donor may be deleted later; the project's totals still count the gift
+    donor = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+")
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["project", "donor"], name="aid_archived_donation_proj_idx"),
+        ]
+
+
+class ProjectArchive(models.Model):
+    """
+    A closed project whose donations, volunteers and beneficiaries were
+    moved off the hot tables. The project row, its ProjectStats and the daily
+    rollups stay, so its totals read the same as before.
+    """
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name="archive")
+    archived_at = models.DateTimeField(auto_now_add=True)
+    file = models.CharField(max_length=255)  # storage name of the volunteers/beneficiaries JSONL
+    donation_count = models.PositiveIntegerField(default=0)
+    donation_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    volunteer_count = models.PositiveIntegerField(default=0)
+    beneficiary_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Archive of project {self.project_id}"
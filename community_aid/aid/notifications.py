@@ -0,0 +1,44 @@
+"""
+Email notifications with an outbox.
+
+queue() stores Notification rows alongside the change they report, in the
+same transaction, and queues a job with their ids. deliver() sends the
+still-unsent ones over a single mail connection and stamps sent_at, so a
+retried job never mails anyone twice.
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import get_connection, EmailMessage
+from django.utils import timezone
+
+from .models import Notification
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_BATCH = 500
+
+
+def queue(notifications):
+    created = Notification.objects.bulk_create(notifications, batch_size=DELIVERY_BATCH)
+    if created:
+        enqueue(deliver, [n.pk for n in created], queue="email")
+    return created
+
+
+def deliver(ids):
+    connection = get_connection()
+    for start in range(0, len(ids), DELIVERY_BATCH):
+        batch = list(
+            Notification.objects.filter(pk__in=ids[start:start + DELIVERY_BATCH], sent_at__isnull=True)
+            .select_related("recipient")
+        )
+        messages = [
+            EmailMessage(n.subject, n.message, settings.DEFAULT_FROM_EMAIL, [n.recipient.email], connection=connection)
+            for n in batch if n.recipient.email
+        ]
+        connection.send_messages(messages)
+        # Recipients without an email address are marked too: there is nothing to retry
+        Notification.objects.filter(pk__in=[n.pk for n in batch]).update(sent_at=timezone.now())
+        logger.info("Delivered %d of %d notifications", len(messages), len(batch))
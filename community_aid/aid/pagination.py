@@ -0,0 +1,188 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Page-number pagination for the small tables (projects, beneficiaries, users).
+    Clients may shrink or grow the page with ?page_size= up to max_page_size.
+    """
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Pages over an unordered queryset can repeat or skip rows
+        if not queryset.ordered:
+            queryset = queryset.order_by("pk")
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views: the count and the page run on the async ORM.
+        """
+        if not queryset.ordered:
+            queryset = queryset.order_by("pk")
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()  # fills the cached_property
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        self.request = request
+        return list(self.page)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination on (ordering_field, id), newest first.
+
+    The cursor holds the last row's key, so page N costs one indexed range
+    scan just like page 1, and rows inserted meanwhile never shift a page.
+    """
+    ordering_field = None
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            value = parse_datetime(data["v"])
+            pk = int(data["id"])
+            reverse = bool(data.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk), reverse
+
+    def encode_cursor(self, obj, reverse):
+        data = {"v": getattr(obj, self.ordering_field).isoformat(), "id": obj.pk, "r": int(reverse)}
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """
+        The sliced queryset for the requested page (one row extra, to detect
+        more). Evaluate it however suits the caller, then pass the rows to set_page.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+        field = self.ordering_field
+
+        if self.position is not None:
+            value, pk = self.position
+            lookup = "gt" if self.reverse else "lt"
+            # The redundant bound on the leading column gives the planner an
+            # index range to start from; the OR alone would be a filter
+            queryset = queryset.filter(
+                Q(**{f"{field}__{lookup}e": value}),
+                Q(**{f"{field}__{lookup}": value}) | Q(**{field: value, f"pk__{lookup}": pk}),
+            )
+        order = (field, "pk") if self.reverse else (f"-{field}", "-pk")
+        return queryset.order_by(*order)[:self.size + 1]
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def set_page(self, rows):
+        size, position, reverse = self.size, self.position, self.reverse
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        # Walking backwards, "more" lies before us and a next page always exists
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        self.rows = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class DonationKeysetPagination(KeysetPagination):
+    ordering_field = "date"
+
+
+class VolunteerKeysetPagination(KeysetPagination):
+    ordering_field = "date_joined"
+
+
+class PaginationModeMixin:
+    """
+    Lets clients choose the pagination mode per request with ?pagination=page|cursor.
+    Views list the modes they support in pagination_modes; pagination_class is the default.
+    """
+    pagination_query_param = "pagination"
+    pagination_modes = {"page": StandardPagination}
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            mode = self.request.query_params.get(self.pagination_query_param) if self.request else None
+            pagination_class = self.pagination_modes.get(mode, self.pagination_class)
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
@@ -0,0 +1,214 @@
+"""
+Monthly range partitions of the donations table (PostgreSQL, optional).
+
+`manage.py partition_donations --convert` rebuilds aid_donation, in one
+transaction that locks it, as a table partitioned by month of date. The
+rows, indexes and foreign keys are carried over, and a DEFAULT partition
+catches dates no month covers yet, e.g. old imports. After that,
+`manage.py partition_donations` (daily from cron) keeps
+AID_DONATION_PARTITIONS_AHEAD months ready and moves anything the default
+partition caught into its month.
+
+Each month is its own table with its own indexes. Queries bounded by date
+(keyset pages past a cursor, exports and rollup rebuilds over a range, the
+admin date filter) only scan the months they cover. Autovacuum and index
+maintenance work one month at a time, and closed months stop changing.
+Old months emptied by archiving (aid/archive.py) can be dropped with
+--drop-empty.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes (id, date). The id sequence still makes id unique.
+Foreign keys can't point at such a table, so PaymentIntent.donation loses
+its database constraint; Django still applies on_delete.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Donation
+
+TABLE = Donation._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def bound(month):
+    # Months are UTC, as the stored timestamps are
+    return f"'{datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()}'"
+
+
+def months_between(first, last):
+    """
+    The first days of the months from first's through last's.
+    """
+    month, months = month_start(first), []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+    row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def partitions(cursor):
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+        [TABLE],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def conversion_sql(cursor, ahead):
+    """
+    Lock the plain table and return the statements that turn it into a
+    partitioned one.
+    """
+    # Before reading the bounds, so no insert lands between them and the copy
+    cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", [TABLE]
+    )
+    indexes = [definition for name, definition in cursor.fetchall() if name != f"{TABLE}_pkey"]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [TABLE],
+    )
+    outgoing = cursor.fetchall()
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+        [TABLE],
+    )
+    incoming = cursor.fetchall()
+    cursor.execute(f'SELECT min("date"), coalesce(max(id), 0) FROM {TABLE}')
+    first, last_id = cursor.fetchone()
+
+    this_month = month_start(timezone.now())
+    staging = f"{TABLE}_partitioned"
+    sql = [
+        f'CREATE TABLE {staging} (LIKE {TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE ("date")',
+    ]
+    for month in months_between(min(first, timezone.now()) if first else this_month, add_months(this_month, ahead)):
+        sql.append(
+            f"CREATE TABLE {partition_name(month)} PARTITION OF {staging} "
+            f"FOR VALUES FROM ({bound(month)}) TO ({bound(add_months(month, 1))})"
+        )
+    sql += [
+        f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {staging} DEFAULT",
+        f"INSERT INTO {staging} SELECT * FROM {TABLE}",
+    ]
+    sql += [f"ALTER TABLE {table} DROP CONSTRAINT {name}" for table, name in incoming]
+    sql += [
+        f"DROP TABLE {TABLE}",
+        f"ALTER TABLE {staging} RENAME TO {TABLE}",
+        f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, "date")',
+        # The identity sequence went with the old table
+        f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id",
+        f"SELECT setval('{TABLE}_id_seq', {last_id + 1}, false)",
+        f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')",
+    ]
+    sql += [f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}" for name, definition in outgoing]
+    sql += indexes  # created on the parent, they cascade to every partition
+    return sql
+
+
+def create_partition_sql(month):
+    """
+    Add month's partition, moving in any of its rows the default partition holds.
+    """
+    name = partition_name(month)
+    lower, upper = bound(month), bound(add_months(month, 1))
+    return [
+        f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)",
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE "date" >= {lower} AND "date" < {upper} RETURNING *) '
+        f"INSERT INTO {name} SELECT * FROM moved",
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})",
+    ]
+
+
+def run(statements):
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def convert(ahead):
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in conversion_sql(cursor, ahead):
+            cursor.execute(statement)
+
+
+def ensure_months(months):
+    """
+    Create the partitions missing for these months. Returns the names created.
+    """
+    with connection.cursor() as cursor:
+        existing = set(partitions(cursor))
+    created = []
+    for month in sorted({month_start(month) for month in months}):
+        if partition_name(month) not in existing:
+            run(create_partition_sql(month))
+            created.append(partition_name(month))
+    return created
+
+
+def ensure_partitions(ahead, today=None):
+    """
+    Create the missing partitions from this month through `ahead` months on.
+    Returns the names created.
+    """
+    this_month = month_start(today or timezone.now())
+    return ensure_months(months_between(this_month, add_months(this_month, ahead)))
+
+
+def prepare_for(moments):
+    """
+    Before inserting donations dated `moments`: on a partitioned table,
+    create their months' partitions if --drop-empty removed them, so the
+    rows don't pile up in the default partition.
+    """
+    if connection.vendor != "postgresql":
+        return []
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return []
+    return ensure_months(moments)
+
+
+def drop_empty_partitions(before):
+    """
+    Drop the monthly partitions wholly before `before` that hold no rows.
+    """
+    dropped = []
+    with connection.cursor() as cursor:
+        for name in partitions(cursor):
+            if name == DEFAULT_PARTITION or name >= partition_name(month_start(before)):
+                continue
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"DROP TABLE {name}")
+                dropped.append(name)
+    return dropped
+
+
+def default_partition_rows():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {DEFAULT_PARTITION}")
+        return cursor.fetchone()[0]
@@ -0,0 +1,263 @@
+"""
+M-Pesa donations through Flutterwave.
+
+mpesa_donate only records a PaymentIntent; initiate_payment runs in the
+background over a pooled keep-alive session, and settle_payment is called
+by the signed webhook to write the Donation exactly once.
+
+The async donation view awaits ainitiate_payment instead, over an httpx
+AsyncClient, so the event loop serves other requests during the gateway call.
+It holds one of PAYMENT_MAX_IN_FLIGHT gateway_calls slots while it does;
+background calls are already bounded by the "payments" job queue's workers.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import threading
+import uuid
+import weakref
+from decimal import Decimal, InvalidOperation
+
+import httpx
+import requests
+from django.conf import settings
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import notifications
+from .models import Donation, Notification, PaymentIntent
+from .throttling import InFlightLimit
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+gateway_calls = InFlightLimit(lambda: getattr(settings, "PAYMENT_MAX_IN_FLIGHT", 20))
+
+
+def get_session():
+    """
+    One process-wide Session: connections to the gateway are pooled and kept
+    alive, so each payment skips the TCP and TLS handshakes.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Flutterwave dedupes on tx_ref, so retrying a POST cannot double charge
+            retry = Retry(
+                total=2,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"POST"}),
+            )
+            pool_size = getattr(settings, "PAYMENT_HTTP_POOL_SIZE", 20)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Authorization"] = f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"
+            _session = session
+    return _session
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    The AsyncClient for the running event loop. httpx connections belong to
+    the loop that opened them, so each loop (one per ASGI worker) gets its own pool.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool_size = getattr(settings, "PAYMENT_HTTP_POOL_SIZE", 20)
+        # httpx rejects the bare "Bearer " an unset key would produce
+        headers = {"Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"} if settings.FLUTTERWAVE_SECRET_KEY else {}
+        client = httpx.AsyncClient(
+            headers=headers,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            # httpx only retries failed connects; safe for the same reason as above
+            transport=httpx.AsyncHTTPTransport(retries=2),
+            timeout=getattr(settings, "PAYMENT_HTTP_TIMEOUT", 30),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+class InvalidDonation(Exception):
+    pass
+
+
+def clean_donation(data, idempotency_key=None):
+    """
+    Validate a donation request body and its Idempotency-Key header.
+    Returns (project_id, amount, phone, idempotency_key).
+    """
+    amount = data.get("amount")
+    phone = data.get("phone")
+    project_id = data.get("projectId")
+
+    if not all([amount, phone, project_id]):
+        raise InvalidDonation("All fields are required")
+    # Longer values than the columns hold fail the insert
+    if len(str(phone)) > PaymentIntent._meta.get_field("phone").max_length:
+        raise InvalidDonation("Invalid phone number")
+    if idempotency_key and len(idempotency_key) > PaymentIntent._meta.get_field("idempotency_key").max_length:
+        raise InvalidDonation("Idempotency-Key is too long")
+    try:
+        amount = Decimal(str(amount))
+    except InvalidOperation:
+        raise InvalidDonation("Invalid amount")
+    if not amount.is_finite() or amount <= 0:
+        raise InvalidDonation("Invalid amount")
+    return project_id, amount, phone, idempotency_key or None
+
+
+def new_tx_ref(donor_id, project_id):
+    return f"donation_{donor_id}_{project_id}_{uuid.uuid4().hex[:12]}"
+
+
+def build_payload(intent):
+    donor = intent.donor
+    return {
+        "tx_ref": intent.tx_ref,
+        "amount": str(intent.amount),
+        "currency": intent.currency,
+        "payment_type": "mpesa",
+        "customer": {
+            "email": donor.email,
+            "phonenumber": intent.phone,
+            "name": donor.username,
+        },
+        "customizations": {
+            "title": "Community Aid Donation",
+            "description": f"Donation to {intent.project.title}",
+        },
+    }
+
+
+# Intents the gateway may still be asked to charge
+RETRYABLE = ("pending", "unknown")
+
+
+def initiate_payment(intent_id):
+    """
+    Background step: ask the gateway to start the M-Pesa charge. When the
+    call errors or times out the charge may or may not have started, so the
+    intent becomes "unknown" and the error is raised for the job queue to
+    retry with the same tx_ref; a success webhook settles it either way.
+    """
+    intent = PaymentIntent.objects.select_related("donor", "project").get(pk=intent_id)
+    if intent.status not in RETRYABLE:
+        return  # already handled by an earlier attempt or the webhook
+
+    try:
+        response = get_session().post(
+            f"{settings.FLUTTERWAVE_BASE_URL}/v3/payments",
+            json=build_payload(intent),
+            timeout=getattr(settings, "PAYMENT_HTTP_TIMEOUT", 30),
+        )
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Payment request for %s failed: %s", intent.tx_ref, e)
+        PaymentIntent.objects.filter(pk=intent.pk, status__in=RETRYABLE).update(status="unknown", error=str(e))
+        raise
+    PaymentIntent.objects.filter(pk=intent.pk, status__in=RETRYABLE).update(
+        **gateway_outcome(response.ok, response.status_code, data)
+    )
+
+
+async def ainitiate_payment(intent_id):
+    """
+    initiate_payment for async views. Returns the updated intent.
+    """
+    intent = await PaymentIntent.objects.select_related("donor", "project").aget(pk=intent_id)
+    if intent.status not in RETRYABLE:
+        return intent
+
+    try:
+        response = await get_async_client().post(
+            f"{settings.FLUTTERWAVE_BASE_URL}/v3/payments",
+            json=build_payload(intent),
+        )
+        data = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning("Payment request for %s failed: %r", intent.tx_ref, e)
+        # The charge may have started: the webhook can still settle it
+        changes = {"status": "unknown", "error": str(e) or type(e).__name__}  # httpx messages may be empty
+    else:
+        changes = gateway_outcome(response.is_success, response.status_code, data)
+    if await PaymentIntent.objects.filter(pk=intent.pk, status__in=RETRYABLE).aupdate(**changes):
+        for name, value in changes.items():
+            setattr(intent, name, value)
+    else:
+        await intent.arefresh_from_db()  # the webhook got there first
+    return intent
+
+
+def gateway_outcome(ok, status_code, data):
+    """
+    The PaymentIntent fields to set from the gateway's answer to /v3/payments.
+    """
+    if not isinstance(data, dict):
+        data = {}  # valid JSON, but not the object the gateway documents
+    if ok and data.get("status") == "success":
+        details = data.get("data")
+        return {"status": "initiated", "payment_link": details.get("link", "") if isinstance(details, dict) else ""}
+    return {"status": "failed", "error": data.get("message") or f"Gateway returned HTTP {status_code}"}
+
+
+def sign(body):
+    """
+    HMAC-SHA256 of the raw webhook body, base64 encoded (flutterwave-signature header).
+    """
+    digest = hmac.new(settings.FLUTTERWAVE_WEBHOOK_SECRET.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_signature(body, signature):
+    if not settings.FLUTTERWAVE_WEBHOOK_SECRET or not signature:
+        return False
+    return hmac.compare_digest(sign(body), signature)
+
+
+def settle_payment(data):
+    """
+    Apply a verified "charge.completed" payload. Safe to call any number of
+    times for the same tx_ref: the intent row is locked and only settled once.
+    Returns the intent, or None if the tx_ref is unknown.
+    """
+    with transaction.atomic():
+        intent = PaymentIntent.objects.select_for_update().filter(tx_ref=data.get("tx_ref")).first()
+        if intent is None:
+            return None
+        # A success still settles an intent we had given up on: the donor paid
+        if intent.status == "successful" or (intent.status == "failed" and data.get("status") != "successful"):
+            return intent  # duplicate delivery
+
+        try:
+            paid = Decimal(str(data.get("amount")))
+        except (InvalidOperation, ValueError):
+            paid = Decimal(0)
+        if data.get("status") != "successful":
+            intent.status = "failed"
+            intent.error = data.get("processor_response") or "Payment was not completed"
+        elif paid < intent.amount or data.get("currency", intent.currency) != intent.currency:
+            intent.status = "failed"
+            intent.error = f"Gateway reported {paid} {data.get('currency')}, expected {intent.amount} {intent.currency}"
+        else:
+            intent.status = "successful"
+            intent.donation = Donation.objects.create(donor_id=intent.donor_id, project_id=intent.project_id, amount=intent.amount)
+            notifications.queue([Notification(
+                recipient_id=intent.donor_id,
+                subject="Thank you for your donation",
+                message=f"We received your donation of {intent.amount} {intent.currency} (reference {intent.tx_ref}).",
+            )])
+        intent.gateway_reference = str(data.get("id") or "")
+        intent.save()
+        return intent
@@ -1,5 +1,9 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+# Permission classes that limit which rows a user may see or change also
+# define filter_queryset(request, queryset, view), the same rule as a SQL
+# filter. VisibilityMixin applies it in get_queryset().
+
 # PROJECT PERMISSIONS
 class IsProjectOwnerOrReadOnly(BasePermission):
     """
@@ -10,7 +14,12 @@ class IsProjectOwnerOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:  # GET, HEAD, OPTIONS
             return True
         # Only creator or admin can update/delete
-        return obj.created_by == request.user or request.user.is_staff
+        return obj.created_by_id == request.user.id or request.user.is_staff
+
+    def filter_queryset(self, request, queryset, view):
+        if request.method in SAFE_METHODS or request.user.is_staff:
+            return queryset
+        return queryset.filter(created_by=request.user.id)
 
 # DONATION PERMISSIONS
 class IsDonationOwnerOrAdmin(BasePermission):
@@ -21,36 +30,70 @@ class IsDonationOwnerOrAdmin(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        return obj.donor == request.user
+        return obj.donor_id == request.user.id
+
+    def filter_queryset(self, request, queryset, view):
+        if request.user.is_staff:
+            return queryset
+        return queryset.filter(donor=request.user.id)  # aid_donation_donor_date_idx
 
 # BENEFICIARY PERMISSIONS
 class IsBeneficiaryOrAdmin(BasePermission):
     """
-    Beneficiaries can only view/update their own record.
+    Beneficiaries have no account: everyone else sees approved records only.
     Admins can view/edit all.
     """
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        return obj.user == request.user  # assuming Beneficiary has a FK to User
+        return obj.approved
+
+    def filter_queryset(self, request, queryset, view):
+        if request.user.is_staff:
+            return queryset
+        return queryset.filter(approved=True)  # aid_benef_approved_proj_idx
 
 
 class CanApproveBeneficiary(BasePermission):
     """
-    Only admins can approve beneficiaries.
+    Only admins can approve or reject beneficiaries (and volunteers).
     """
     def has_permission(self, request, view):
-        if view.action == "approve":  # custom action
+        if view.action in ("approve", "reject"):  # ApprovalMixin actions
             return request.user.is_staff
         return True
 
 # VOLUNTEER PERMISSIONS
 class IsVolunteerOrAdmin(BasePermission):
     """
-    Volunteers can only manage their own record.
+    Everyone sees approved volunteers; volunteers can only manage their own record.
     Admins can manage all.
     """
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        return obj.user == request.user
+        if request.method in SAFE_METHODS:
+            return obj.status == "approved"
+        return obj.user_id == request.user.id
+
+    def filter_queryset(self, request, queryset, view):
+        if request.user.is_staff:
+            return queryset
+        if request.method in SAFE_METHODS:
+            return queryset.filter(status="approved")
+        return queryset.filter(user=request.user.id)
+
+
+class VisibilityMixin:
+    """
+    Viewset mixin: get_queryset() only returns rows the view's permission
+    classes allow. List, retrieve, export, search and page counts then
+    share one WHERE clause, and get_object() answers 404 for anything else
+    instead of loading the row and checking it in Python.
+    """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for permission in self.get_permissions():
+            if hasattr(permission, "filter_queryset"):
+                queryset = permission.filter_queryset(self.request, queryset, self)
+        return queryset
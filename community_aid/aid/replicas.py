@@ -0,0 +1,106 @@
+"""
+Read replicas.
+
+AID_DB_REPLICAS lists database aliases that replicate "default". GET/HEAD
+requests to the aid viewsets (ReplicaReadsMixin) and the async read views
+read from one of them, picked once per request so a page and its count
+agree. Every write, and every read anywhere else (admin, jobs,
+authentication), uses the primary.
+
+A user whose request wrote something is pinned to the primary for
+AID_DB_STICKY_SECONDS, longer than the replication lag, so they read their
+own writes. The pin lives in the AID_DB_STICKY_CACHE cache alias, which
+has to be shared between processes for the pin to follow the user.
+"""
+import contextlib
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+STICKY_KEY = "aid:db:primary:{}"
+
+_read_alias = contextvars.ContextVar("aid_read_alias", default=None)
+
+
+def replicas():
+    return list(getattr(settings, "AID_DB_REPLICAS", ()))
+
+
+def _sticky_cache():
+    return caches[getattr(settings, "AID_DB_STICKY_CACHE", "responses")]
+
+
+def pin_to_primary(user):
+    if user is not None and user.is_authenticated:
+        _sticky_cache().set(STICKY_KEY.format(user.pk), 1, getattr(settings, "AID_DB_STICKY_SECONDS", 5))
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and _sticky_cache().get(STICKY_KEY.format(user.pk)) is not None
+
+
+def choose_replica(user):
+    """
+    The alias this user's reads should use now, or None for the primary.
+    """
+    aliases = replicas()
+    if not aliases or is_pinned(user):
+        return None
+    return random.choice(aliases)
+
+
+def reading_replica():
+    return _read_alias.get() is not None
+
+
+@contextlib.contextmanager
+def replica_reads(user):
+    """
+    Route the block's reads to a replica unless user is pinned to the primary.
+    """
+    token = _read_alias.set(choose_replica(user))
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    DATABASE_ROUTERS entry: reads go where replica_reads() says, writes to default.
+    """
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        pool = {"default", *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    View mixin: safe-method requests read from a replica; a successful
+    unsafe one pins its user to the primary.
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)  # authenticates on the primary
+        if request.method in SAFE_METHODS:
+            self._read_alias_token = _read_alias.set(choose_replica(request.user))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_read_alias_token", None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
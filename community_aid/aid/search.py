@@ -0,0 +1,71 @@
+"""
+Ranked search over projects and beneficiaries, for /api/search/ and the admin.
+
+On PostgreSQL, projects are matched with full-text search against
+project_search_vector() (title weighted A, description B, status C). A GIN
+index is built on that same expression, so PostgreSQL keeps the index
+current on every write and uses it for the @@ match. Beneficiary names are
+matched fuzzily with pg_trgm (the % operator), backed by a trigram GIN
+index, and ranked by similarity.
+
+Other databases (the SQLite test runs) fall back to icontains matching:
+every word must appear somewhere, and a rank mirrors the A/B/C weights.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+from .models import SEARCH_CONFIG, project_search_vector
+
+# PostgreSQL's default ts_rank weights for A, B and C
+FALLBACK_WEIGHTS = {"title": 1.0, "description": 0.4, "status": 0.2}
+
+
+def uses_postgres(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def search_projects(queryset, term):
+    """
+    Projects matching term, best first, annotated with rank.
+    """
+    if uses_postgres(queryset):
+        query = SearchQuery(term, search_type="websearch", config=SEARCH_CONFIG)
+        return (
+            queryset.alias(document=project_search_vector())
+            .filter(document=query)
+            .annotate(rank=SearchRank(F("document"), query))
+            .order_by("-rank", "pk")
+        )
+
+    words = term.split()
+    matches = Q()
+    rank = Value(0.0)
+    for word in words:
+        matches &= Q(title__icontains=word) | Q(description__icontains=word) | Q(status__icontains=word)
+        rank += Case(
+            *(When(**{f"{field}__icontains": word}, then=Value(weight)) for field, weight in FALLBACK_WEIGHTS.items()),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    return queryset.filter(matches).annotate(rank=rank).order_by("-rank", "pk")
+
+
+def search_beneficiaries(queryset, term):
+    """
+    Beneficiaries whose name resembles term, most similar first, annotated with rank.
+    """
+    if uses_postgres(queryset):
+        return (
+            queryset.filter(name__trigram_similar=term)
+            .annotate(rank=TrigramSimilarity("name", term))
+            .order_by("-rank", "pk")
+        )
+
+    rank = Case(
+        When(name__iexact=term, then=Value(1.0)),
+        When(name__istartswith=term, then=Value(0.75)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    )
+    return queryset.filter(name__icontains=term).annotate(rank=rank).order_by("-rank", "pk")
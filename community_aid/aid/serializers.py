@@ -1,15 +1,52 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Project, Donation, Beneficiary, Volunteer
+from .images import photo_urls
+from .models import Project, ProjectStats, Donation, Beneficiary, Volunteer, PaymentIntent
+from .sparse import SparseFieldsMixin
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class ProjectSerializer(serializers.ModelSerializer):
+class PublicUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    What any signed-in user may see of another, e.g. ?expand=donor.
+    """
+    profile_photo = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'profile_photo']
+        fast_fields = {"profile_photo": ("profile_photo", photo_urls)}  # see aid/fastlist.py
+        cache_group = "users"  # for responses that expand a user, see aid/cache.py
+
+    def get_profile_photo(self, obj):
+        # {"original": url, "small": {"webp": url, "jpg": url}, "medium": {...}}; no storage calls
+        return photo_urls(obj.profile_photo.name)
+
+class ProjectStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProjectStats
+        fields = ['project', 'total_amount', 'donation_count', 'donor_count', 'last_donation_at']
+        read_only_fields = fields
+
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Donation aggregates, read from the ProjectStats row instead of summing donations
+    total_donated = serializers.DecimalField(source='donation_stats.total_amount', max_digits=14, decimal_places=2, read_only=True)
+    donation_count = serializers.IntegerField(source='donation_stats.donation_count', read_only=True)
+    donor_count = serializers.IntegerField(source='donation_stats.donor_count', read_only=True)
+    last_donation_at = serializers.DateTimeField(source='donation_stats.last_donation_at', read_only=True)
+
     class Meta:
         model = Project
         fields = '__all__'
+        expandable_fields = {"created_by": PublicUserSerializer}
+        cache_group = "projects"
+        field_sources = {"donation_stats": ("stats",)}
 
-class DonationSerializer(serializers.ModelSerializer):
+class ProjectSearchSerializer(ProjectSerializer):
+    rank = serializers.FloatField(read_only=True)
+
+class DonationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     donor = serializers.SlugRelatedField(
         slug_field="username",  # use the username instead of ID
         queryset=User.objects.all()  # allows searching donor by username
@@ -21,24 +58,68 @@ class DonationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Donation
         fields = '__all__'  # includes project, donor, amount, etc.
+        expandable_fields = {"donor": PublicUserSerializer, "project": ProjectSerializer}
         extra_kwargs = {
             "amount": {"required": True},  # makes sure amount must be provided
         }
-class BeneficiarySerializer(serializers.ModelSerializer):
+
+    def hidden_fields(self):
+        # Views set hide_amount for non-admins: amounts are visible to admins only
+        return {"amount"} if self.context.get("hide_amount") else set()
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for name in self.hidden_fields() & data.keys():
+            data[name] = None
+        return data
+
+class BeneficiarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Beneficiary
         fields = '__all__'
+        expandable_fields = {"project": ProjectSerializer}
+
+class BeneficiarySearchSerializer(BeneficiarySerializer):
+    rank = serializers.FloatField(read_only=True)
 
-class VolunteerSerializer(serializers.ModelSerializer):
+class VolunteerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Volunteer
         fields = '__all__'
+        expandable_fields = {"user": PublicUserSerializer, "project": ProjectSerializer}
         read_only_fields = ["status"]
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(PublicUserSerializer):
+    class Meta(PublicUserSerializer.Meta):
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'profile_photo']
+
+class PaymentIntentSerializer(serializers.ModelSerializer):
     class Meta:
-        model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff']
+        model = PaymentIntent
+        fields = ['id', 'tx_ref', 'status', 'amount', 'currency', 'project', 'payment_link', 'error', 'donation', 'created_at']
+        read_only_fields = fields
+
+class BulkApprovalSerializer(serializers.Serializer):
+    """
+    Body of the bulk approve/reject actions: a list of ids or a filter, not both.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, required=False)
+    filter = serializers.DictField(allow_empty=False, required=False)
+
+    @staticmethod
+    def max_rows():
+        return getattr(settings, "AID_BULK_APPROVAL_MAX", 10000)
+
+    def validate_ids(self, value):
+        limit = self.max_rows()
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} ids")
+        return value
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Send either ids or filter")
+        return attrs
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .authentication import revoke_user
+from .cache import invalidate, invalidate_later
+from .models import (
+    Donation, ProjectStats, Project, Beneficiary, Volunteer, User,
+    DailyProjectDonations, DailyDonorDonations,
+)
+
+# Sent with donations=[...] by code that bulk_creates donations, inside its transaction
+donations_bulk_created = Signal()
+
+ROLLUPS = (DailyProjectDonations, DailyDonorDonations)
+
+
+def as_change(donation, sign):
+    return {
+        "project_id": donation.project_id,
+        "donor_id": donation.donor_id,
+        "amount": donation.amount,
+        "date": donation.date,
+        "sign": sign,
+    }
+
+
+def update_rollups(changes):
+    for rollup in ROLLUPS:
+        rollup.apply(changes)
+
+
+# DONATION AGGREGATES
+@receiver(pre_save, sender=Donation)
+def remember_previous_donation(sender, instance, raw=False, **kwargs):
+    """
+    Stash the stored version of an edited donation so post_save can
+    back it out of the old project's aggregate.
+    """
+    instance._previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous = (
+        Donation.objects.filter(pk=instance.pk)
+        .values("project_id", "donor_id", "amount", "date")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Donation)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # loaddata: run rebuild_project_stats afterwards
+    previous = getattr(instance, "_previous", None)
+    changes = [as_change(instance, +1)]
+    if previous is not None:
+        ProjectStats.remove_donation(exclude_pk=instance.pk, **previous)
+        changes.append(dict(previous, sign=-1))
+    ProjectStats.add_donation(instance)
+    update_rollups(changes)
+
+
+@receiver(post_delete, sender=Donation)
+def update_stats_on_delete(sender, instance, **kwargs):
+    ProjectStats.remove_donation(
+        project_id=instance.project_id,
+        donor_id=instance.donor_id,
+        amount=instance.amount,
+        date=instance.date,
+    )
+    update_rollups([as_change(instance, -1)])
+
+
+@receiver(donations_bulk_created)
+def update_stats_on_bulk_create(sender, donations, **kwargs):
+    ProjectStats.add_donations(donations)
+    update_rollups([as_change(donation, +1) for donation in donations])
+
+
+# RESPONSE CACHE INVALIDATION
+# "users" only keys responses that ?expand= a user
+CACHE_GROUPS = {
+    Project: "projects",
+    Beneficiary: "beneficiaries",
+    Volunteer: "volunteers",
+    User: "users",
+}
+# Project responses embed the donation aggregates, so ProjectStats writes count
+# too; but every donation makes one, so they are coalesced (see aid/cache.py)
+COALESCED_CACHE_GROUPS = {
+    ProjectStats: "projects",
+}
+
+
+# Connected for every sender: signals for a proxy model (e.g. the ClaimsUser
+# that request.user is) name the proxy, not the concrete model
+def invalidate_cached_responses(sender, **kwargs):
+    model = sender._meta.concrete_model
+    if model in CACHE_GROUPS:
+        invalidate(CACHE_GROUPS[model])
+    elif model in COALESCED_CACHE_GROUPS:
+        invalidate_later(COALESCED_CACHE_GROUPS[model], getattr(settings, "AID_STATS_INVALIDATE_SECONDS", 30))
+
+
+post_save.connect(invalidate_cached_responses, dispatch_uid="aid-cache-save")
+post_delete.connect(invalidate_cached_responses, dispatch_uid="aid-cache-delete")
+
+
+# JWT USER SNAPSHOTS
+@receiver(post_save)
+@receiver(post_delete)
+def revoke_cached_user(sender, instance, **kwargs):
+    if issubclass(sender, User):
+        revoke_user(instance.pk)
@@ -0,0 +1,237 @@
+"""
+Database-backed job queue for slow side effects (gateway calls, email).
+
+enqueue() stores a Job row naming a module-level function and its JSON
+arguments. Because the row is written in the caller's transaction, a job
+only becomes visible to workers once the change it belongs to commits,
+and vanishes with it on rollback. `manage.py run_jobs` runs workers.
+
+Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED where the
+database supports it, so they never wait on each other; a conditional
+UPDATE makes the claim safe everywhere else. A job that raises is retried
+with exponential backoff until max_attempts, then marked failed. Queues
+listed in AID_JOB_QUEUES run at most that many jobs at once across all
+workers.
+
+With AID_TASKS_EAGER = True, enqueue() runs the function inline instead
+(tests, management commands).
+"""
+import json
+import logging
+import os
+import random
+import socket
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def job_name(func):
+    name = f"{func.__module__}.{func.__qualname__}"
+    if "<" in name:
+        raise ValueError(f"Only module-level functions can be queued, not {name}")
+    return name
+
+
+def enqueue(func, *args, queue="default", run_at=None, delay=None, max_attempts=None, **kwargs):
+    """
+    Queue func(*args, **kwargs). Arguments must be JSON serializable.
+    run_at (a datetime) or delay (seconds) schedules the job for later.
+    """
+    name = job_name(func)
+    if getattr(settings, "AID_TASKS_EAGER", False):
+        # Same round trip as a worker would do, so non-JSON arguments fail in tests too
+        payload = json.loads(json.dumps([args, kwargs]))
+        call(name, *payload)
+        return None
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        queue=queue,
+        run_at=run_at,
+        max_attempts=max_attempts or getattr(settings, "AID_JOB_MAX_ATTEMPTS", 5),
+    )
+
+
+def call(name, args, kwargs):
+    try:
+        import_string(name)(*args, **kwargs)
+    except Exception:
+        # Eager mode runs in tests and development: a broken job must fail loudly there
+        logger.exception("Job %s failed", name)
+        raise
+
+
+def backoff(attempts):
+    """
+    Seconds before retry number `attempts`: doubling from AID_JOB_BACKOFF,
+    capped at AID_JOB_BACKOFF_MAX, with jitter so failed jobs don't retry in lockstep.
+    """
+    base = getattr(settings, "AID_JOB_BACKOFF", 30)
+    cap = getattr(settings, "AID_JOB_BACKOFF_MAX", 3600)
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def recycle_connections():
+    """
+    Between jobs, what a request's end does: drop broken or expired connections.
+    Not inside a transaction (a test case's), where the connection isn't ours
+    to close.
+    """
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+class Worker:
+    """
+    Claims and runs jobs one at a time. `manage.py run_jobs` starts one per process.
+    """
+    maintenance_interval = 60
+
+    def __init__(self, queues=None, name=None, poll_interval=1.0):
+        self.queues = list(queues) if queues else None
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.limits = getattr(settings, "AID_JOB_QUEUES", {})
+        self.stopping = False
+        self.last_maintenance = 0.0
+
+    def run(self, burst=False):
+        """
+        Work until stop() is called, or, with burst, until nothing is due.
+        """
+        while not self.stopping:
+            if time.monotonic() - self.last_maintenance > self.maintenance_interval:
+                self.maintenance()
+            try:
+                job = self.claim()
+            except DatabaseError:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                if burst:
+                    return
+                time.sleep(self.poll_interval)
+                recycle_connections()
+                continue
+            self.execute(job)
+            recycle_connections()
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def full_queues(self):
+        """
+        Queues that have reached their AID_JOB_QUEUES limit right now.
+        """
+        if not self.limits:
+            return set()
+        running = (
+            Job.objects.filter(status="running", queue__in=list(self.limits))
+            .values_list("queue").annotate(n=Count("id"))
+        )
+        return {queue for queue, n in running if n >= self.limits[queue]}
+
+    def claim(self, retries=3):
+        """
+        The next due job, now marked running for this worker, or None.
+        """
+        for _ in range(retries):
+            job, raced = self.try_claim()
+            if not raced:
+                return job
+        return None
+
+    def try_claim(self):
+        """
+        Returns (job, raced): raced is True when another worker took the row first.
+        """
+        due = Job.objects.filter(status="queued", run_at__lte=timezone.now())
+        if self.queues is not None:
+            due = due.filter(queue__in=self.queues)
+        full = self.full_queues()
+        if full:
+            due = due.exclude(queue__in=full)
+
+        skip_locked = connection.features.has_select_for_update_skip_locked
+        # SQLite can't upgrade a read transaction to a write one under contention,
+        # so there the two statements run in autocommit and the UPDATE arbitrates
+        with transaction.atomic() if skip_locked else nullcontext():
+            if skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            job = due.order_by("run_at", "id").first()
+            if job is None:
+                return None, False
+            now = timezone.now()
+            claimed = Job.objects.filter(pk=job.pk, status="queued").update(
+                status="running", locked_by=self.name, locked_at=now, attempts=F("attempts") + 1,
+            )
+        if not claimed:
+            return None, True
+        job.status, job.locked_by, job.locked_at, job.attempts = "running", self.name, now, job.attempts + 1
+
+        limit = self.limits.get(job.queue)
+        if limit is not None and Job.objects.filter(queue=job.queue, status="running").count() > limit:
+            # Lost a race for the last slot: hand the job back untouched
+            Job.objects.filter(pk=job.pk, locked_by=self.name).update(
+                status="queued", locked_by="", locked_at=None, attempts=F("attempts") - 1,
+            )
+            return None, False
+        return job, False
+
+    def execute(self, job):
+        started = time.monotonic()
+        try:
+            import_string(job.name)(*job.args, **job.kwargs)
+        except Exception as e:
+            self.failed(job, e)
+        else:
+            Job.objects.filter(pk=job.pk).update(status="done", finished_at=timezone.now(), locked_by="")
+            logger.info("Job %s #%s done in %.3fs", job.name, job.pk, time.monotonic() - started)
+
+    def failed(self, job, error):
+        error_text = f"{type(error).__name__}: {error}"
+        if job.attempts < job.max_attempts:
+            delay = backoff(job.attempts)
+            logger.warning("Job %s #%s failed (attempt %d), retrying in %.0fs: %s", job.name, job.pk, job.attempts, delay, error_text)
+            Job.objects.filter(pk=job.pk).update(
+                status="queued", run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error_text, locked_by="", locked_at=None,
+            )
+        else:
+            logger.error("Job %s #%s failed for good after %d attempts: %s", job.name, job.pk, job.attempts, error_text)
+            Job.objects.filter(pk=job.pk).update(
+                status="failed", finished_at=timezone.now(), last_error=error_text, locked_by="",
+            )
+
+    def maintenance(self):
+        """
+        Requeue jobs whose worker died mid-run and drop old finished jobs.
+        """
+        self.last_maintenance = time.monotonic()
+        now = timezone.now()
+        stale = Job.objects.filter(status="running", locked_at__lt=now - timedelta(seconds=getattr(settings, "AID_JOB_TIMEOUT", 600)))
+        # A job that keeps taking its worker down must not loop forever
+        stale.filter(attempts__gte=F("max_attempts")).update(
+            status="failed", finished_at=now, locked_by="", last_error="Worker lost",
+        )
+        requeued = stale.update(
+            status="queued", run_at=now, locked_by="", locked_at=None, last_error="Worker lost",
+        )
+        if requeued:
+            logger.warning("Requeued %d jobs abandoned by their worker", requeued)
+        keep = now - timedelta(days=getattr(settings, "AID_JOB_RETENTION_DAYS", 7))
+        Job.objects.filter(status="done", finished_at__lt=keep).delete()
@@ -0,0 +1,233 @@
+"""
+Admission control: token-bucket rate limits and a cap on in-flight gateway calls.
+
+Endpoints that are expensive per request (a login is a password hash, a
+donation a gateway call) get a TokenBucketThrottle subclass with its own
+scope. AID_THROTTLE_RATES[scope] sets up to three budgets, each
+"<requests>/<s|min|hour|day>":
+
+    "user": per authenticated user (for logins, per username tried from one address)
+    "ip": per client address (REMOTE_ADDR, or with REST_FRAMEWORK
+          NUM_PROXIES the address that many hops back in X-Forwarded-For)
+    "global": shared by every client of the scope
+
+A bucket holds that many tokens and refills at that rate, so short bursts
+pass and a sustained flood is cut down to the rate. A request takes a token
+from each bucket, the most specific first, so one noisy client empties its
+own bucket before it can touch the shared one. Refused requests get DRF's
+429 with a Retry-After header.
+
+A login bucket keyed on the username alone would let anyone lock an
+account out by spending its budget with bad passwords, so it is keyed on
+the username and the client address. The price is that guesses at one
+account spread over many addresses are only bounded by the "global"
+budget.
+
+Buckets live in this process unless AID_THROTTLE_CACHE names a CACHES alias
+shared between processes. That backend reads and writes a bucket without a
+lock, so requests racing on one bucket can overshoot its budget slightly.
+Async views call aallow_request(), which uses the cache's async methods so
+the event loop never waits on the cache server.
+"""
+import contextlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+BUCKET_KEY = "aid:throttle:{}:{}:{}"
+PERIODS = {"s": 1, "sec": 1, "min": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate):
+    """
+    "20/min" -> (capacity 20, refill 1/3 token per second)
+    """
+    count, _, period = rate.partition("/")
+    try:
+        count, seconds = int(count), PERIODS[period]
+    except (ValueError, KeyError):
+        raise ValueError(f"Bad rate {rate!r}, expected e.g. '20/min' (periods: {', '.join(PERIODS)})")
+    return count, count / seconds
+
+
+def refill(bucket, capacity, per_second, now):
+    """
+    The tokens in bucket (tokens, stamp) at now; a new bucket is full.
+    """
+    if bucket is None:
+        return capacity
+    tokens, stamp = bucket
+    return min(capacity, tokens + (now - stamp) * per_second)
+
+
+class LocalBucketStore:
+    """
+    Buckets in this process, the least recently used dropped (i.e. refilled) past maxsize.
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, per_second):
+        """
+        Take a token: 0 if there was one, else the seconds until there will be.
+        """
+        now = time.time()
+        with self._lock:
+            tokens = refill(self._buckets.get(key), capacity, per_second, now)
+            wait = 0 if tokens >= 1 else (1 - tokens) / per_second
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def atake(self, key, capacity, per_second):
+        return self.take(key, capacity, per_second)  # memory only, nothing to await
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in a Django cache, shared by every process using it.
+    """
+    def __init__(self, alias):
+        self.alias = alias
+
+    @staticmethod
+    def spend(bucket, capacity, per_second):
+        """
+        (wait, bucket to store, its timeout) for take() and atake().
+        """
+        now = time.time()
+        tokens = refill(bucket, capacity, per_second, now)
+        wait = 0 if tokens >= 1 else (1 - tokens) / per_second
+        # Once full again the bucket is the same as a missing one
+        return wait, (tokens - 1 if not wait else tokens, now), int(capacity / per_second) + 1
+
+    def take(self, key, capacity, per_second):
+        cache = caches[self.alias]
+        wait, bucket, timeout = self.spend(cache.get(key), capacity, per_second)
+        cache.set(key, bucket, timeout=timeout)
+        return wait
+
+    async def atake(self, key, capacity, per_second):
+        cache = caches[self.alias]
+        wait, bucket, timeout = self.spend(await cache.aget(key), capacity, per_second)
+        await cache.aset(key, bucket, timeout=timeout)
+        return wait
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+local_buckets = LocalBucketStore()
+
+
+def get_store():
+    alias = getattr(settings, "AID_THROTTLE_CACHE", None)
+    return CacheBucketStore(alias) if alias else local_buckets
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle over the user, ip and global buckets of AID_THROTTLE_RATES[scope].
+    """
+    scope = None
+
+    def __init__(self):
+        self._wait = None
+
+    def get_user_ident(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return str(user.pk)
+        return None
+
+    def get_budgets(self, request):
+        """
+        [(kind, ident, rate)] in the order their buckets are tried.
+        """
+        rates = getattr(settings, "AID_THROTTLE_RATES", {}).get(self.scope, {})
+        idents = (("user", self.get_user_ident(request)), ("ip", self.get_ident(request)), ("global", "*"))
+        return [(kind, ident, rates[kind]) for kind, ident in idents if ident and rates.get(kind)]
+
+    def allow_request(self, request, view):
+        store = get_store()
+        for kind, ident, rate in self.get_budgets(request):
+            wait = store.take(BUCKET_KEY.format(self.scope, kind, ident), *parse_rate(rate))
+            if wait:
+                self._wait = wait
+                return False
+        return True
+
+    async def aallow_request(self, request, view):
+        store = get_store()
+        for kind, ident, rate in self.get_budgets(request):
+            wait = await store.atake(BUCKET_KEY.format(self.scope, kind, ident), *parse_rate(rate))
+            if wait:
+                self._wait = wait
+                return False
+        return True
+
+    def wait(self):
+        return self._wait
+
+
+class LoginThrottle(TokenBucketThrottle):
+    scope = "login"
+
+    def get_user_ident(self, request):
+        # Logins are anonymous: budget the account being tried, from this address
+        username = request.data.get("username") if hasattr(request.data, "get") else None
+        username = str(username or "").strip().lower()
+        return f"{username}@{self.get_ident(request)}" if username else None
+
+
+class RegisterThrottle(TokenBucketThrottle):
+    scope = "register"
+
+
+class DonateThrottle(TokenBucketThrottle):
+    scope = "donate"
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many requests in progress, try again shortly."
+    default_code = "overloaded"
+    wait = 1  # DRF sends it as Retry-After
+
+
+class InFlightLimit:
+    """
+    At most limit() concurrent holders of slot() in this process. A caller
+    past the limit gets Overloaded at once rather than waiting in line
+    behind calls that may take the gateway's full timeout.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def slot(self):
+        with self._lock:
+            if self.active >= self.limit():
+                raise Overloaded()
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
@@ -1,8 +1,9 @@
-from aid.views import mpesa_donate
-from .views import RegisterView
+from aid.views import mpesa_donate, mpesa_webhook, payment_status, metrics, slow_requests
+from .views import ProfilePhotoView, RegisterView, SearchView
+from . import async_views
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProjectViewSet, DonationViewSet, BeneficiaryViewSet, VolunteerViewSet, UserViewSet
+from .views import ProjectViewSet, DonationViewSet, BeneficiaryViewSet, VolunteerViewSet, UserViewSet, AnalyticsViewSet
 
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet)
@@ -10,12 +11,27 @@ router.register(r'donations', DonationViewSet)
 router.register(r'beneficiaries', BeneficiaryViewSet)
 router.register(r'volunteers', VolunteerViewSet)
 router.register(r'users', UserViewSet)
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 
 
 urlpatterns = [
     path('', include(router.urls)),
     path("donate/mpesa/", mpesa_donate),
-    path("register/", RegisterView.as_view(), name="register")
+    path("donate/mpesa/webhook/", mpesa_webhook, name="mpesa-webhook"),
+    path("donate/mpesa/<str:tx_ref>/", payment_status, name="payment-status"),
+    path("metrics/", metrics, name="metrics"),
+    path("metrics/slow/", slow_requests, name="metrics-slow"),
+    path("register/", RegisterView.as_view(), name="register"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("profile/photo/", ProfilePhotoView.as_view(), name="profile-photo"),
+    # Async (ASGI) variants of the hot read paths and the donation
+    path("async/projects/", async_views.project_list, name="async-project-list"),
+    path("async/projects/<int:pk>/", async_views.project_detail, name="async-project-detail"),
+    path("async/donations/", async_views.donation_list, name="async-donation-list"),
+    path("async/donations/<int:pk>/", async_views.donation_detail, name="async-donation-detail"),
+    path("async/volunteers/", async_views.volunteer_list, name="async-volunteer-list"),
+    path("async/volunteers/<int:pk>/", async_views.volunteer_detail, name="async-volunteer-detail"),
+    path("async/donate/mpesa/", async_views.mpesa_donate, name="async-mpesa-donate"),
 ]
 
 urlpatterns += router.urls
@@ -1,86 +1,144 @@
-import requests
 from django.conf import settings
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponse
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from rest_framework import viewsets, permissions
-from rest_framework.exceptions import PermissionDenied
-from .models import Project, Donation, Beneficiary, Volunteer
-from .serializers import ProjectSerializer, UserSerializer, DonationSerializer, BeneficiarySerializer,VolunteerSerializer, UserSerializer
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
+from .models import Project, Donation, Beneficiary, Volunteer, PaymentIntent, Notification
+from .serializers import ProjectSerializer, ProjectStatsSerializer, UserSerializer, DonationSerializer, BeneficiarySerializer,VolunteerSerializer, UserSerializer, PaymentIntentSerializer, ProjectSearchSerializer, BeneficiarySearchSerializer
 from django.contrib.auth import get_user_model
+from .pagination import (
+    PaginationModeMixin,
+    StandardPagination,
+    DonationKeysetPagination,
+    VolunteerKeysetPagination,
+)
+from .approvals import ApprovalMixin, beneficiary_workflow, volunteer_workflow
+from .cache import CachedResponseMixin
+from .exports import ExportMixin
+from .fastlist import FastListMixin
+from . import analytics, images, middleware as profiling, notifications
+from .ingest import DonationImporter, IngestError, detect_format, iter_rows
+from .replicas import ReplicaReadsMixin
+from .search import search_beneficiaries, search_projects
+from .sparse import SparseViewMixin
+from .payments import InvalidDonation, clean_donation, initiate_payment, new_tx_ref, settle_payment, verify_signature
+from .tasks import enqueue
+from .throttling import DonateThrottle, RegisterThrottle
 from .permissions import (
     IsProjectOwnerOrReadOnly,
     IsDonationOwnerOrAdmin,
     IsBeneficiaryOrAdmin,
     IsVolunteerOrAdmin,
+    VisibilityMixin,
 )
 
 User = get_user_model()
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([DonateThrottle])
 def mpesa_donate(request):
     """
-    Initiates an M-Pesa payment via Flutterwave for a specific project
+    Initiates an M-Pesa payment via Flutterwave for a specific project.
+    Records a pending PaymentIntent and returns 202 straight away; the gateway
+    call runs in the background and the webhook settles the donation.
+    Clients may send an Idempotency-Key header to make retries safe.
     """
-    amount = request.data.get("amount")
-    phone = request.data.get("phone")
-    project_id = request.data.get("projectId")
+    try:
+        project_id, amount, phone, idempotency_key = clean_donation(
+            request.data, request.headers.get("Idempotency-Key")
+        )
+    except InvalidDonation as e:
+        return Response({"error": str(e)}, status=400)
 
-    if not all([amount, phone, project_id]):
-        return Response({"error": "All fields are required"}, status=400)
+    if idempotency_key:
+        existing = PaymentIntent.objects.filter(donor=request.user, idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return Response(PaymentIntentSerializer(existing).data)
 
     # Get the project
-    try:
-        project = Project.objects.get(id=project_id)
-    except Project.DoesNotExist:
+    if not Project.objects.filter(id=project_id).exists():
         return Response({"error": "Project not found"}, status=404)
 
-    # Prepare payload for Flutterwave
-    payload = {
-        "tx_ref": f"donation_{request.user.id}_{project_id}",
-        "amount": amount,
-        "currency": "KES",
-        "payment_type": "mpesa",
-        "customer": {
-            "email": request.user.email,
-            "phonenumber": phone,
-            "name": request.user.username,
-        },
-        "customizations": {
-            "title": "Community Aid Donation",
-            "description": f"Donation to {project.title}",
-        },
-    }
+    try:
+        with transaction.atomic():
+            intent = PaymentIntent.objects.create(
+                donor=request.user,
+                project_id=project_id,
+                amount=amount,
+                phone=phone,
+                tx_ref=new_tx_ref(request.user.id, project_id),
+                idempotency_key=idempotency_key,
+            )
+    except IntegrityError:
+        # Lost a race with a concurrent retry carrying the same key
+        intent = PaymentIntent.objects.get(donor=request.user, idempotency_key=idempotency_key)
+        return Response(PaymentIntentSerializer(intent).data)
+
+    enqueue(initiate_payment, intent.pk, queue="payments")
+    return Response(PaymentIntentSerializer(intent).data, status=202)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def payment_status(request, tx_ref):
+    """
+    Lets the client poll a payment it started.
+    """
+    try:
+        intent = PaymentIntent.objects.get(tx_ref=tx_ref, donor=request.user)
+    except PaymentIntent.DoesNotExist:
+        return Response({"error": "Payment not found"}, status=404)
+    return Response(PaymentIntentSerializer(intent).data)
 
-    headers = {
-        "Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"
-    }
 
-    try:
-        # Call Flutterwave API
-        response = requests.post(
-            "https://api.flutterwave.com/v3/payments",
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
-        response_data = response.json()
-    except requests.RequestException as e:
-        return Response({"error": "Payment request failed", "details": str(e)}, status=500)
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def mpesa_webhook(request):
+    """
+    Flutterwave callback. Only requests signed with FLUTTERWAVE_WEBHOOK_SECRET are accepted.
+    """
+    if not verify_signature(request.body, request.headers.get("flutterwave-signature")):
+        return Response({"error": "Invalid signature"}, status=403)
+
+    if request.data.get("event") != "charge.completed":
+        return Response({"status": "ignored"})
 
-    # Save donation as pending in database
-    Donation.objects.create(
-        donor=request.user,
-        project=project,
-        amount=amount,
-        payment_method="mpesa",
-        status="pending"
-    )
+    intent = settle_payment(request.data.get("data") or {})
+    if intent is None:
+        return Response({"error": "Unknown transaction"}, status=404)
+    return Response({"status": intent.status})
 
-    return Response(response_data)
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """
+    Per-route request metrics in Prometheus text format (AID_PROFILING must be on).
+    """
+    if not settings.AID_PROFILING:
+        return Response({"error": "Profiling is disabled"}, status=404)
+    return HttpResponse(profiling.registry.prometheus(), content_type="text/plain; version=0.0.4")
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def slow_requests(request):
+    """
+    The most recent slow requests with their full query lists.
+    """
+    if not settings.AID_PROFILING:
+        return Response({"error": "Profiling is disabled"}, status=404)
+    return Response(list(profiling.registry.slow))
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -93,31 +151,63 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return request.user.is_staff
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+class ProjectViewSet(ReplicaReadsMixin, VisibilityMixin, CachedResponseMixin, PaginationModeMixin, SparseViewMixin, viewsets.ModelViewSet):
+    queryset = Project.objects.select_related("stats")
     serializer_class = ProjectSerializer
     permission_classes = [IsProjectOwnerOrReadOnly]
+    cache_group = "projects"
 
 
     def get_permissions(self):
         if self.request.method in ['GET', 'HEAD', 'OPTIONS']:
-            return [permissions.IsAuthenticated()]
+            return [permissions.IsAuthenticated(), IsProjectOwnerOrReadOnly()]
         return [permissions.IsAdminUser()]
 
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        """
+        Donation totals for one project, served from the aggregate table.
+        """
+        project = self.get_object()
+        return Response(ProjectStatsSerializer(project.donation_stats).data)
+
 
-class DonationViewSet(viewsets.ModelViewSet):
-    queryset = Donation.objects.all()
+class DonationViewSet(ReplicaReadsMixin, VisibilityMixin, ExportMixin, PaginationModeMixin, FastListMixin, SparseViewMixin, viewsets.ModelViewSet):
+    # donor and project are rendered by username/title, fetch them in the same query
+    queryset = Donation.objects.select_related("donor", "project")
     serializer_class = DonationSerializer
     permission_classes = [IsDonationOwnerOrAdmin]
+    # Donations grow without bound: keyset on (date, id) by default, page numbers on request
+    pagination_class = DonationKeysetPagination
+    pagination_modes = {"page": StandardPagination, "cursor": DonationKeysetPagination}
+    export_fields = {"id": "id", "donor": "donor__username", "project": "project__title", "amount": "amount", "date": "date"}
+    export_date_field = "date"
 
 
     def get_permissions(self):
-        # Allow GET for all authenticated users
+        # Authenticated users read their own donations, admins all of them
         if self.request.method in ['GET', 'HEAD', 'OPTIONS']:
-            return [permissions.IsAuthenticated()]
+            return [permissions.IsAuthenticated(), IsDonationOwnerOrAdmin()]
         # Only admin/staff for create/update/delete
         return [permissions.IsAdminUser()]
 
+    @action(detail=False, methods=["post"], url_path="bulk", parser_classes=[MultiPartParser])
+    def bulk(self, request):
+        """
+        Admin-only bulk import of a CSV or JSONL file (multipart field "file").
+        Returns a report with per-line errors; valid rows are imported.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload a CSV or JSONL file in the 'file' field"}, status=400)
+        try:
+            fmt = detect_format(upload.name, request.data.get("file_format"))
+        except IngestError as e:
+            return Response({"error": str(e)}, status=400)
+        importer = DonationImporter()
+        report = importer.run(iter_rows(upload.open("rb"), fmt))
+        return Response(report, status=201 if report["created"] else 400)
+
     def get_serializer_context(self):
         # Pass request to serializer so it can check if user is admin
         context = super().get_serializer_context()
@@ -127,22 +217,32 @@ class DonationViewSet(viewsets.ModelViewSet):
             context['hide_amount'] = True
         return context
 
+    def get_export_fields(self):
+        # Same rule as hide_amount: amounts are for admins only
+        fields = dict(self.export_fields)
+        if not self.request.user.is_staff:
+            fields.pop("amount")
+        return fields
+
 
 
 
-class BeneficiaryViewSet(viewsets.ModelViewSet):
-    queryset = Beneficiary.objects.all()
+class BeneficiaryViewSet(ReplicaReadsMixin, VisibilityMixin, ApprovalMixin, CachedResponseMixin, ExportMixin, PaginationModeMixin, FastListMixin, SparseViewMixin, viewsets.ModelViewSet):
+    queryset = Beneficiary.objects.select_related("project")
     serializer_class = BeneficiarySerializer
     permission_classes = [IsBeneficiaryOrAdmin]
+    approval_workflow = beneficiary_workflow
+    approval_filter_fields = ("project", "approved")
+    export_fields = {"id": "id", "project": "project__title", "name": "name", "contact_info": "contact_info", "approved": "approved"}
+    cache_group = "beneficiaries"
+    cache_actions = ("list",)
 
-
-    def get_queryset(self):
-        if self.request.user.is_staff:
-            return Beneficiary.objects.all()
-        return Beneficiary.objects.filter(approved=True)
+    def get_cache_variant(self):
+        # Only the shared approved-only list is cached; staff always read live
+        return None if self.request.user.is_staff else "approved"
 
     def perform_create(self, serializer):
-        serializer.save(approved=False)  # Always save as unapproved
+        serializer.save(approved=None)  # Always pending until an admin decides
     
     def perform_update(self, serializer):
         # Only admins can update/edit beneficiaries
@@ -156,30 +256,176 @@ class BeneficiaryViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Only admins can delete beneficiaries.")
         instance.delete()
 
-class VolunteerViewSet(viewsets.ModelViewSet):
-    queryset = Volunteer.objects.all()
+class VolunteerViewSet(ReplicaReadsMixin, VisibilityMixin, ApprovalMixin, CachedResponseMixin, ExportMixin, PaginationModeMixin, FastListMixin, SparseViewMixin, viewsets.ModelViewSet):
+    # Volunteer.__str__ reads user.username and project.title
+    queryset = Volunteer.objects.select_related("user", "project")
     serializer_class = VolunteerSerializer
     permission_classes = [IsVolunteerOrAdmin]
-
-    def get_queryset(self):
-        # Admin sees all volunteers
-        if self.request.user.is_staff:
-            return Volunteer.objects.all()
-        
-        # Everyone else sees only approved volunteers
-        return Volunteer.objects.filter(status="approved")
+    approval_workflow = volunteer_workflow
+    approval_filter_fields = ("project", "status", "role")
+    pagination_class = VolunteerKeysetPagination
+    pagination_modes = {"page": StandardPagination, "cursor": VolunteerKeysetPagination}
+    export_fields = {"id": "id", "user": "user__username", "project": "project__title", "role": "role", "status": "status", "date_joined": "date_joined"}
+    export_date_field = "date_joined"
+    cache_group = "volunteers"
+    cache_actions = ("list",)
+
+    def get_cache_variant(self):
+        return None if self.request.user.is_staff else "approved"
 
     def perform_create(self, serializer):
         # When a volunteer applies, status must be pending
         serializer.save(status="pending")
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(ReplicaReadsMixin, PaginationModeMixin, FastListMixin, SparseViewMixin, viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]  # Only admins can view users
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(ReplicaReadsMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [permissions.AllowAny]
\ No newline at end of file
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegisterThrottle]
+
+    def perform_create(self, serializer):
+        user = serializer.save()
+        # The welcome email goes out from the job queue, not in the request
+        notifications.queue([Notification(
+            recipient=user,
+            subject="Welcome to Community Aid",
+            message=f"Hi {user.username}, your account is ready.",
+        )])
+
+class ProfilePhotoView(ReplicaReadsMixin, APIView):
+    """
+    POST a multipart "photo" to set the current user's profile photo, DELETE to clear it.
+    The upload is validated and downscaled here; thumbnails are built by a background job.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("photo")
+        if upload is None:
+            return Response({"error": "Upload an image in the 'photo' field"}, status=400)
+        try:
+            name = images.process_upload(upload)
+        except images.InvalidImage as e:
+            return Response({"error": str(e)}, status=400)
+        # Files are shared by content hash, so the previous photo is never deleted here
+        request.user.profile_photo = name
+        request.user.save(update_fields=["profile_photo"])
+        enqueue(images.generate_variants, name, queue="images")
+        return Response(UserSerializer(request.user).data["profile_photo"], status=201)
+
+    def delete(self, request):
+        request.user.profile_photo = None
+        request.user.save(update_fields=["profile_photo"])
+        return Response(status=204)
+
+
+def photo_variant(request, name):
+    """
+    Serves MEDIA_URL/profiles/variants/<name>, building the file first if the
+    background job hasn't yet. The web server answers hits straight from disk.
+    """
+    match = images.VARIANT_NAME.match(name)
+    if not match or match["size"] not in images.VARIANT_SIZES or match["ext"] not in images.VARIANT_FORMATS:
+        raise Http404
+    try:
+        path = images.build_variant(match["digest"], match["size"], match["ext"])
+    except (FileNotFoundError, images.InvalidImage):
+        raise Http404
+    response = FileResponse(images.default_storage.open(path, "rb"))
+    # The name is derived from the content, so it can be cached forever
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+class SearchView(ReplicaReadsMixin, SparseViewMixin, generics.ListAPIView):
+    """
+    Ranked search, best match first: ?q=<words>&type=projects|beneficiaries.
+    Searches what the matching list endpoint would show this user.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardPagination
+    search_types = {
+        "projects": (ProjectViewSet, search_projects, ProjectSearchSerializer),
+        "beneficiaries": (BeneficiaryViewSet, search_beneficiaries, BeneficiarySearchSerializer),
+    }
+    max_query_length = 200
+
+    def get_search_type(self):
+        name = self.request.query_params.get("type", "projects")
+        if name not in self.search_types:
+            raise ValidationError({"type": f"Must be one of: {', '.join(self.search_types)}"})
+        return self.search_types[name]
+
+    def get_term(self):
+        term = self.request.query_params.get("q", "").strip()
+        if not term:
+            raise ValidationError({"q": "This parameter is required"})
+        if len(term) > self.max_query_length:
+            raise ValidationError({"q": f"At most {self.max_query_length} characters"})
+        return term
+
+    def get_queryset(self):
+        viewset_class, search, _ = self.get_search_type()
+        # The list endpoint's queryset carries its visibility rules and select_related
+        listing = viewset_class(request=self.request, action="list", args=(), kwargs={}, format_kwarg=None)
+        return search(listing.get_queryset(), self.get_term())
+
+    def get_serializer_class(self):
+        return self.get_search_type()[2]
+
+
+class AnalyticsViewSet(ReplicaReadsMixin, viewsets.ViewSet):
+    """
+    Donation trends for program managers, read from the daily rollup tables.
+    Query parameters: start, end (YYYY-MM-DD, inclusive).
+    """
+    permission_classes = [permissions.IsAdminUser]  # amounts are admin-only
+
+    def get_limit(self, request):
+        try:
+            return min(max(int(request.query_params.get("limit", 10)), 1), 100)
+        except ValueError:
+            raise ValidationError({"limit": "Must be a number"})
+
+    def get_id(self, request, name):
+        value = request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: "Must be an id"})
+
+    @action(detail=False, methods=["get"])
+    def timeseries(self, request):
+        """
+        interval=day|week|month, optional project or donor id, moving_average=<periods>.
+        """
+        start, end = analytics.parse_range(request.query_params)
+        interval = request.query_params.get("interval", "day")
+        window = self.get_id(request, "moving_average")
+        if window is not None and not 1 <= window <= analytics.MAX_MOVING_AVERAGE:
+            raise ValidationError({"moving_average": f"Must be between 1 and {analytics.MAX_MOVING_AVERAGE}"})
+        results = analytics.time_series(
+            start, end, interval,
+            project=self.get_id(request, "project"),
+            donor=self.get_id(request, "donor"),
+            moving_average=window,
+        )
+        return Response({"start": start, "end": end, "interval": interval, "results": results})
+
+    @action(detail=False, methods=["get"], url_path="top-donors")
+    def top_donors(self, request):
+        start, end = analytics.parse_range(request.query_params)
+        return Response({"start": start, "end": end, "results": analytics.top_donors(start, end, self.get_limit(request))})
+
+    @action(detail=False, methods=["get"], url_path="top-projects")
+    def top_projects(self, request):
+        start, end = analytics.parse_range(request.query_params)
+        return Response({"start": start, "end": end, "results": analytics.top_projects(start, end, self.get_limit(request))})
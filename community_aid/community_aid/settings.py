@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # trigram lookups for aid.search
     'rest_framework',
     'aid',
     'drf_yasg',
@@ -46,14 +48,15 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'aid.User'
 
 
+# EmailBackend also accepts usernames and inherits ModelBackend's permission checks
 AUTHENTICATION_BACKENDS = [
     "aid.auth_backends.EmailBackend",
-    "django.contrib.auth.backends.ModelBackend",
 ]
 
 
 
 MIDDLEWARE = [
+    'aid.middleware.ProfilingMiddleware',  # Removes itself unless AID_PROFILING is on
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -65,6 +68,10 @@ MIDDLEWARE = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Request profiling (aid/middleware.py), served on /api/metrics/
+AID_PROFILING = os.environ.get("AID_PROFILING", "") == "1"
+AID_PROFILING_SLOW_MS = 500
+
 
 ROOT_URLCONF = 'community_aid.urls'
 
@@ -97,9 +104,49 @@ DATABASES = {
         'PASSWORD': 'Omwamibarasa',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Keep each worker's connection open between requests instead of
+        # reconnecting every time; it is pinged before reuse after an error
+        'CONN_MAX_AGE': int(os.environ.get('AID_DB_CONN_MAX_AGE', 300)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas (aid/replicas.py): AID_DB_REPLICA_HOSTS="host[:port],..." adds
+# replica_1, replica_2, ... with the primary's credentials. Tests mirror them.
+AID_DB_REPLICAS = []
+for _n, _host in enumerate(filter(None, os.environ.get('AID_DB_REPLICA_HOSTS', '').split(',')), 1):
+    _name, _, _port = _host.strip().partition(':')
+    DATABASES[f'replica_{_n}'] = {
+        **DATABASES['default'],
+        'HOST': _name,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    AID_DB_REPLICAS.append(f'replica_{_n}')
+DATABASE_ROUTERS = ['aid.replicas.ReplicaRouter']
+# After a write its user reads from the primary for this long (> replication lag)
+AID_DB_STICKY_SECONDS = 5
+AID_DB_STICKY_CACHE = 'responses'  # shared between processes when AID_CACHE_BACKEND is
+
+
+
+# Caches
+# "responses" backs the API response cache (aid/cache.py). Local memory by
+# default; point AID_CACHE_BACKEND/AID_CACHE_LOCATION at a shared cache such as
+# django.core.cache.backends.redis.RedisCache when running several processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get('AID_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('AID_CACHE_LOCATION', 'aid-responses'),
+    },
+}
+AID_RESPONSE_CACHE_ALIAS = 'responses'
+AID_RESPONSE_CACHE_TIMEOUT = 300
+# Donation totals in cached project responses may lag by this much (see aid/cache.py)
+AID_STATS_INVALIDATE_SECONDS = 30
 
 
 # Password validation
@@ -138,21 +185,90 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files. Serve MEDIA_ROOT from the web server and fall back to Django
+# for missing profiles/variants/ files, which are built on demand (aid/images.py)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+AID_PHOTO_MAX_BYTES = 10 * 1024 * 1024
+AID_PHOTO_MAX_PIXELS = 40_000_000
+AID_PHOTO_MAX_EDGE = 1024
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'aid.authentication.FastJWTAuthentication',  # Bearer tokens first, so API calls never touch the session
         'rest_framework.authentication.SessionAuthentication',  # For login via browser session
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',    # For basic username/password auth
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',  # Require authentication by default
     ],
+    # Page-number by default; donations and volunteers use keyset pagination (see aid/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'aid.pagination.StandardPagination',
+    'PAGE_SIZE': 50,
+    # orjson with DRF's output, see aid/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'aid.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Reverse proxies in front of the app. Throttles key clients on the address
+    # that many hops back in X-Forwarded-For; 0 ignores the header, which any
+    # client can set, and uses REMOTE_ADDR
+    'NUM_PROXIES': int(os.environ.get('AID_NUM_PROXIES', '0')),
+}
+# Flutterwave M-Pesa payments (see aid/payments.py)
+FLUTTERWAVE_SECRET_KEY = os.environ.get("FLUTTERWAVE_SECRET_KEY", "")
+FLUTTERWAVE_WEBHOOK_SECRET = os.environ.get("FLUTTERWAVE_WEBHOOK_SECRET", "")
+# Point at `manage.py run_stub_gateway` to exercise the pipeline offline
+FLUTTERWAVE_BASE_URL = os.environ.get("FLUTTERWAVE_BASE_URL", "https://api.flutterwave.com")
+PAYMENT_HTTP_POOL_SIZE = 20
+PAYMENT_HTTP_TIMEOUT = 30
+# Async donations past this many gateway calls get a 503 instead of waiting for a connection
+PAYMENT_MAX_IN_FLIGHT = PAYMENT_HTTP_POOL_SIZE
+
+# Background jobs (aid/tasks.py, `manage.py run_jobs`); eager runs them inline
+AID_TASKS_EAGER = False
+AID_JOB_MAX_ATTEMPTS = 5
+AID_JOB_BACKOFF = 30          # seconds before the first retry, doubling after
+AID_JOB_BACKOFF_MAX = 3600
+AID_JOB_TIMEOUT = 600         # a running job older than this lost its worker
+AID_JOB_RETENTION_DAYS = 7
+# Most jobs of a queue running at once, across all workers
+AID_JOB_QUEUES = {
+    "payments": PAYMENT_HTTP_POOL_SIZE,
+    "email": 4,
+    "images": 2,  # thumbnailing is CPU bound
 }
+
+# Most rows one bulk approve/reject request may touch (aid/approvals.py)
+AID_BULK_APPROVAL_MAX = 10000
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+# FastJWTAuthentication user snapshot cache (aid/authentication.py)
+AID_JWT_USER_CACHE_SIZE = 10000
+AID_JWT_USER_CACHE_TTL = 60
+# Token-bucket budgets of the expensive endpoints (aid/throttling.py)
+AID_THROTTLE_RATES = {
+    "login": {"user": "10/min", "ip": "30/min", "global": "50/s"},
+    "register": {"ip": "10/hour", "global": "5/s"},
+    "donate": {"user": "10/min", "ip": "60/min", "global": "20/s"},
+}
+if os.environ.get('AID_THROTTLE_DISABLED'):  # load tests (bench_api, bench_asgi) only
+    AID_THROTTLE_RATES = {}
+# A CACHES alias to share the buckets between processes, or None for per-process buckets
+AID_THROTTLE_CACHE = os.environ.get('AID_THROTTLE_CACHE') or None
+# Admin changelists estimate counts on PostgreSQL past this many rows (aid/admin.py)
+AID_ADMIN_EXACT_COUNT_LIMIT = 100000
+# EmailBackend verified-credential cache (aid/auth_backends.py)
+AID_AUTH_CREDENTIAL_CACHE_SIZE = 1000
+AID_AUTH_CREDENTIAL_CACHE_TTL = 300
+# Projects that ended this many days ago are archived by archive_projects (aid/archive.py)
+AID_ARCHIVE_AFTER_DAYS = 90
+# Months of donation partitions partition_donations keeps ready (aid/partitions.py)
+AID_DONATION_PARTITIONS_AHEAD = 3
 
 
 # Default primary key field type